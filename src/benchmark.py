@@ -0,0 +1,299 @@
+# src/benchmark.py
+# Per-stage microbenchmarks for the detection pipeline, with stored baselines.
+#
+# Every stage from pipeline_stages.py is timed on fixed, deterministic 1080p test frames,
+# so the numbers are comparable between runs and no camera is needed:
+#
+#   python src/benchmark.py                      # run and compare against the latest baseline
+#   python src/benchmark.py --save-baseline      # run and record a new baseline
+#   python src/benchmark.py --tolerance 0.10     # fail on >10% slowdowns
+#
+# Baselines live in metrics/benchmarks/<host>.json, one file per machine (a Pi 4 and a
+# laptop should never be compared with each other). Each file keeps every baseline that was
+# saved, tagged with the git revision it was measured on. The script exits with status 1 if
+# any stage regressed beyond the tolerance, so it can gate a commit or a CI job.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from pipeline_stages import (
+    decode_jpeg, preprocess_frame, ssd_postprocess, draw_detections, encode_jpeg,
+)
+
+SCHEMA_VERSION = 1
+REPO_ROOT = os.path.join(os.path.dirname(__file__), "..")
+BASELINE_DIR = os.path.join(REPO_ROOT, "metrics", "benchmarks")
+MODEL_PATH = os.path.join(REPO_ROOT, "models", "ssd_mobilenet_v2.tflite")
+LABELS_PATH = os.path.join(REPO_ROOT, "models", "coco_labels.txt")
+
+FRAME_SIZE = (1920, 1080)  # Same resolution the servers capture at
+SSD_INPUT_SIZE = (300, 300)
+NUM_TEST_FRAMES = 4
+SEED = 1234
+
+
+def make_test_frames(count=NUM_TEST_FRAMES, size=FRAME_SIZE, seed=SEED):
+    """Builds deterministic BGR test frames: a gradient background, some shapes and sensor-like noise.
+
+    Pure noise would make JPEG decode/encode unrealistically slow and a flat frame unrealistically
+    fast, so the frames mix smooth areas, hard edges and mild noise like a real scene.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    frames = []
+    for i in range(count):
+        gradient_x = np.linspace(0, 255, width, dtype=np.float32)
+        gradient_y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (gradient_x * 0.6 + gradient_y * 0.4 + i * 20) % 256
+        frame[..., 1] = (gradient_y * 0.7 + i * 35) % 256
+        frame[..., 2] = (255 - gradient_x * 0.5) % 256
+
+        for _ in range(12):
+            x, y = int(rng.integers(0, width - 200)), int(rng.integers(0, height - 200))
+            w, h = int(rng.integers(40, 200)), int(rng.integers(40, 200))
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            if rng.random() < 0.5:
+                cv2.rectangle(frame, (x, y), (x + w, y + h), color, -1)
+            else:
+                cv2.circle(frame, (x + w // 2, y + h // 2), min(w, h) // 2, color, -1)
+
+        noise = rng.integers(-8, 9, frame.shape, dtype=np.int16)
+        frames.append(np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def make_ssd_outputs(seed=SEED, num_boxes=10):
+    """Fixed fake outputs of the SSD post-processing op: half the scores are above threshold."""
+    rng = np.random.default_rng(seed)
+    mins = rng.uniform(0.0, 0.7, (num_boxes, 2)).astype(np.float32)
+    sizes = rng.uniform(0.05, 0.3, (num_boxes, 2)).astype(np.float32)
+    boxes = np.concatenate([mins, mins + sizes], axis=1)  # ymin, xmin, ymax, xmax
+    classes = rng.integers(0, 80, num_boxes).astype(np.float32)
+    scores = np.linspace(0.95, 0.05, num_boxes).astype(np.float32)
+    return boxes, classes, scores, num_boxes
+
+
+def load_labels():
+    with open(LABELS_PATH, 'r') as f:
+        return [line.strip() for line in f.readlines()]
+
+
+def time_stage(fn, inputs, iterations, warmup):
+    """Runs fn over the inputs round-robin and returns per-call timings in milliseconds."""
+    for i in range(warmup):
+        fn(inputs[i % len(inputs)])
+    timings = []
+    for i in range(iterations):
+        arg = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings):
+    arr = np.asarray(timings)
+    return {
+        "median_ms": float(np.median(arr)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "min_ms": float(arr.min()),
+        "iterations": len(timings),
+    }
+
+
+def build_stages():
+    """Returns (name, fn, inputs) for every stage that can run on this machine, plus skip notes."""
+    frames = make_test_frames()
+    jpegs = [encode_jpeg(frame).tobytes() for frame in frames]
+    labels = load_labels()
+    ssd_outputs = make_ssd_outputs()
+    detections = ssd_postprocess(*ssd_outputs, labels, *FRAME_SIZE)
+    input_w, input_h = SSD_INPUT_SIZE
+
+    stages = [
+        ("jpeg_decode", decode_jpeg, jpegs),
+        ("preprocess_uint8", lambda img: preprocess_frame(img, input_w, input_h, np.uint8), frames),
+        ("preprocess_float32", lambda img: preprocess_frame(img, input_w, input_h, np.float32), frames),
+        ("ssd_postprocess", lambda out: ssd_postprocess(*out, labels, *FRAME_SIZE), [ssd_outputs]),
+        ("overlay_draw", lambda img: draw_detections(img.copy(), detections), frames),
+        ("frame_copy", lambda img: img.copy(), frames),  # Baseline for overlay_draw, which copies first
+        ("jpeg_encode", encode_jpeg, frames),
+    ]
+    skipped = []
+
+    interpreter_stage = build_interpreter_stage(frames)
+    if isinstance(interpreter_stage, str):
+        skipped.append(("interpreter_invoke", interpreter_stage))
+    else:
+        stages.insert(3, interpreter_stage)
+
+    yolo_stage = build_yolo_postprocess_stage()
+    if isinstance(yolo_stage, str):
+        skipped.append(("yolo_postprocess", yolo_stage))
+    else:
+        stages.insert(5, yolo_stage)
+
+    return stages, skipped
+
+
+def build_interpreter_stage(frames):
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        return "tflite_runtime is not installed"
+    if not os.path.exists(MODEL_PATH):
+        return f"model not found at {MODEL_PATH}"
+
+    interpreter = Interpreter(model_path=MODEL_PATH)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()
+    input_h, input_w = input_details[0]['shape'][1:3]
+    inputs = [preprocess_frame(frame, input_w, input_h, input_details[0]['dtype']) for frame in frames]
+
+    def invoke(input_data):
+        interpreter.set_tensor(input_details[0]['index'], input_data)
+        interpreter.invoke()
+
+    return ("interpreter_invoke", invoke, inputs)
+
+
+def build_yolo_postprocess_stage():
+    """Times Ultralytics' NMS on a fixed raw YOLOv8n output tensor, which is what yolo.py pays per frame."""
+    try:
+        import torch
+        from ultralytics.utils import ops
+    except ImportError:
+        return "ultralytics/torch is not installed"
+
+    generator = torch.Generator().manual_seed(SEED)
+    # YOLOv8n at 640x640: (batch, 4 box coords + 80 class scores, 8400 anchors)
+    prediction = torch.rand((1, 84, 8400), generator=generator)
+    prediction[:, :4] *= 640
+    prediction[:, 4:] *= 0.3  # Mostly background, like a real frame
+
+    return ("yolo_postprocess", lambda pred: ops.non_max_suppression(pred, conf_thres=0.25), [prediction])
+
+
+def host_key():
+    """Identifies the machine class a baseline belongs to, e.g. 'aarch64-4cpu'."""
+    return f"{platform.machine()}-{os.cpu_count()}cpu"
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def baseline_path(key):
+    return os.path.join(BASELINE_DIR, f"{key}.json")
+
+
+def load_baselines(key):
+    path = baseline_path(key)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if data.get("schema") != SCHEMA_VERSION:
+        print(f"Ignoring {path}: schema {data.get('schema')} != {SCHEMA_VERSION}")
+        return []
+    return data["baselines"]
+
+
+def save_baseline(key, results):
+    baselines = load_baselines(key)
+    baselines.append({
+        "revision": git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "stages": results,
+    })
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = baseline_path(key)
+    with open(path, 'w') as f:
+        json.dump({"schema": SCHEMA_VERSION, "host": key, "baselines": baselines}, f, indent=2)
+    print(f"Saved baseline for revision {baselines[-1]['revision']} to: {path}")
+
+
+def compare(results, baseline, tolerance):
+    """Prints a comparison table and returns the names of stages that regressed."""
+    regressions = []
+    print(f"\nComparing against baseline from revision {baseline['revision']} ({baseline['created']}), tolerance {tolerance:.0%}")
+    print(f"{'stage':<22}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, current in results.items():
+        previous = baseline["stages"].get(name)
+        if previous is None:
+            print(f"{name:<22}{'-':>12}{current['median_ms']:>10.2f}ms{'new':>10}")
+            continue
+        change = current["median_ms"] / previous["median_ms"] - 1.0 if previous["median_ms"] > 0 else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  <-- REGRESSION"
+        print(f"{name:<22}{previous['median_ms']:>10.2f}ms{current['median_ms']:>10.2f}ms{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage pipeline microbenchmarks with regression baselines.")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed calls per stage")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed calls per stage before timing")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed median slowdown before failing (0.15 = 15%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the new baseline for this host")
+    parser.add_argument("--against", help="Compare against the baseline of this git revision instead of the latest one")
+    parser.add_argument("--stages", nargs="+", help="Only run these stages")
+    args = parser.parse_args()
+
+    # Single-threaded OpenCV makes per-stage numbers stable and comparable with the Pi's loop
+    cv2.setNumThreads(1)
+
+    stages, skipped = build_stages()
+    if args.stages:
+        stages = [stage for stage in stages if stage[0] in args.stages]
+
+    results = {}
+    print(f"Benchmarking on {host_key()} at {FRAME_SIZE[0]}x{FRAME_SIZE[1]}, {args.iterations} iterations per stage")
+    for name, fn, inputs in stages:
+        results[name] = summarize(time_stage(fn, inputs, args.iterations, args.warmup))
+        print(f"  {name:<22} median {results[name]['median_ms']:8.2f}ms   p90 {results[name]['p90_ms']:8.2f}ms")
+    for name, reason in skipped:
+        print(f"  {name:<22} skipped ({reason})")
+
+    key = host_key()
+    baselines = load_baselines(key)
+    regressions = []
+    if args.against:
+        matching = [b for b in baselines if b["revision"] == args.against]
+        if not matching:
+            print(f"No baseline for revision {args.against} in {baseline_path(key)}")
+            sys.exit(2)
+        regressions = compare(results, matching[-1], args.tolerance)
+    elif baselines:
+        regressions = compare(results, baselines[-1], args.tolerance)
+    else:
+        print(f"\nNo baseline yet for {key}; run with --save-baseline to create one.")
+
+    if args.save_baseline:
+        save_baseline(key, results)
+
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
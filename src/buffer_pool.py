@@ -0,0 +1,133 @@
+# src/buffer_pool.py
+# Reusable frame buffers for the annotate/encode path.
+#
+# A 1080p BGR frame is ~6 MB. Allocating several of those per frame (colour conversion, the
+# annotated copy, ...) makes glibc mmap/munmap big chunks on every iteration and keeps
+# evicting the Pi's small caches. FrameBufferPool hands out arrays keyed by (shape, dtype) and
+# takes them back when the stage is done, so after the first frame the loop runs without any
+# new large allocations.
+#
+# MemoryReport measures this per frame: how many buffers the pool had to allocate, the peak
+# RSS of the process, and (optionally, with tracemalloc) the peak transient bytes allocated
+# through numpy while processing the frame. That last one also catches allocations that
+# don't go through the pool, e.g. cv2.imdecode, which has no output-buffer argument in the
+# Python bindings.
+import resource
+import threading
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+
+
+class FrameBufferPool:
+    def __init__(self, max_free_per_key=4):
+        self.max_free_per_key = max_free_per_key
+        self.free = defaultdict(list)
+        self.lock = threading.Lock()
+
+        self.acquires = 0
+        self.allocations = 0
+        self.allocated_bytes = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Returns a buffer of the given shape/dtype. Its contents are undefined."""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            self.acquires += 1
+            if self.free[key]:
+                return self.free[key].pop()
+            self.allocations += 1
+        buffer = np.empty(shape, dtype=dtype)
+        with self.lock:
+            self.allocated_bytes += buffer.nbytes
+        return buffer
+
+    def release(self, buffer):
+        """Gives a buffer back for reuse. Only release buffers that came from acquire()."""
+        if buffer is None:
+            return
+        key = (buffer.shape, buffer.dtype.str)
+        with self.lock:
+            if len(self.free[key]) < self.max_free_per_key:
+                self.free[key].append(buffer)
+
+    def copy(self, src):
+        """Pooled equivalent of src.copy()."""
+        buffer = self.acquire(src.shape, src.dtype)
+        np.copyto(buffer, src)
+        return buffer
+
+    def stats(self):
+        with self.lock:
+            return {
+                "acquires": self.acquires,
+                "allocations": self.allocations,
+                "allocated_mb": self.allocated_bytes / 1e6,
+                "free_buffers": sum(len(buffers) for buffers in self.free.values()),
+            }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MemoryReport:
+    """Per-frame allocation accounting. Call begin_frame()/end_frame() around each iteration."""
+
+    def __init__(self, pool, trace_allocations=False):
+        self.pool = pool
+        self.trace_allocations = trace_allocations
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self.frames = 0
+        self.last_pool_allocations = 0
+        self.last_transient_mb = None
+        self.max_transient_mb = 0.0
+        self._frame_start_allocations = 0
+        # Totals at the previous summary(), so a once-a-second log line covers every frame since
+        self._summary_frames = 0
+        self._summary_allocations = 0
+        self._summary_transient_mb = None
+        self._frame_start_traced = 0
+
+    def begin_frame(self):
+        self._frame_start_allocations = self.pool.allocations
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            self._frame_start_traced = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(self):
+        self.frames += 1
+        self.last_pool_allocations = self.pool.allocations - self._frame_start_allocations
+        if self.trace_allocations:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.last_transient_mb = (peak - self._frame_start_traced) / 1e6
+            self.max_transient_mb = max(self.max_transient_mb, self.last_transient_mb)
+            self._summary_transient_mb = max(self._summary_transient_mb or 0.0, self.last_transient_mb)
+
+    def summary(self):
+        """One log line covering the frames since the previous summary() call."""
+        frames = self.frames - self._summary_frames
+        allocations = self.pool.allocations - self._summary_allocations
+        line = f"{allocations} pool allocations in {frames} frames, peak RSS {peak_rss_mb():.1f}MB"
+        if self._summary_transient_mb is not None:
+            line += f", up to {self._summary_transient_mb:.1f}MB transient numpy allocations per frame"
+        self._summary_frames = self.frames
+        self._summary_allocations = self.pool.allocations
+        self._summary_transient_mb = None
+        return line
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "pool": self.pool.stats(),
+            "pool_allocations_last_frame": self.last_pool_allocations,
+            "pool_allocations_per_frame": self.pool.allocations / self.frames if self.frames else 0.0,
+            "peak_rss_mb": peak_rss_mb(),
+            "tracing": self.trace_allocations,
+            "transient_mb_last_frame": self.last_transient_mb,
+            "transient_mb_max": self.max_transient_mb if self.trace_allocations else None,
+        }
@@ -0,0 +1,111 @@
+# src/cascade.py
+# Confidence-driven cascade between a cheap and an expensive detector.
+#
+# The 300x300 SSD MobileNet V2 runs on every inference. Only when it is unsure, i.e. some
+# detection scores fall inside the ambiguous band [band_low, band_high), or on a periodic
+# audit frame, is the frame also run through the expensive model (e.g. the 640x640 FPN-Lite
+# SSD). The two result sets are then merged. Frames where the cheap model is clearly sure or
+# clearly sees nothing only pay for the cheap model.
+#
+# ModelCascade has the same interface as the detectors in detectors.py, so it can be used
+# anywhere a single detector can.
+import time
+
+
+def iou(a, b):
+    """Intersection over union of two Detections."""
+    x1, y1 = max(a.x, b.x), max(a.y, b.y)
+    x2, y2 = min(a.x + a.w, b.x + b.w), min(a.y + a.h, b.y + b.h)
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a.w * a.h + b.w * b.h - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def merge_detections(primary, secondary, iou_threshold=0.5):
+    """Keeps every primary detection and adds secondary ones that don't overlap a primary of the same class."""
+    merged = list(primary)
+    for det in secondary:
+        if not any(det.class_id == kept.class_id and iou(det, kept) >= iou_threshold for kept in primary):
+            merged.append(det)
+    return merged
+
+
+class ModelCascade:
+    def __init__(self, cheap, expensive, band_low=0.3, band_high=0.6, score_threshold=0.5, audit_every=30):
+        self.cheap = cheap
+        self.expensive = expensive
+        self.band_low = band_low
+        self.band_high = band_high
+        self.score_threshold = score_threshold
+        self.audit_every = audit_every
+
+        # Let both models report everything down to the bottom of the band; we filter afterwards
+        self.cheap.score_threshold = band_low
+        self.expensive.score_threshold = band_low
+
+        self.max_batch = 1
+        self.input_shape = cheap.input_shape
+
+        self.frames = 0
+        self.escalations = 0
+        self.audits = 0
+        self.expensive_runs = 0
+        self.cheap_ms_total = 0.0
+        self.expensive_ms_total = 0.0
+
+        # Stage timings of the most recent detect() call, summed over both models
+        self.preprocess_ms = 0.0
+        self.inference_ms = 0.0
+        self.postprocess_ms = 0.0
+        self.escalated = False
+
+    def _is_ambiguous(self, detections):
+        return any(self.band_low <= det.score < self.band_high for det in detections)
+
+    def detect(self, img):
+        self.frames += 1
+        start = time.monotonic()
+        cheap_detections = self.cheap.detect(img)
+        self.cheap_ms_total += (time.monotonic() - start) * 1000
+        self.preprocess_ms = self.cheap.preprocess_ms
+        self.inference_ms = self.cheap.inference_ms
+        self.postprocess_ms = self.cheap.postprocess_ms
+
+        audit = bool(self.audit_every) and self.frames % self.audit_every == 0
+        ambiguous = self._is_ambiguous(cheap_detections)
+        # Counted independently: an audit frame can be ambiguous too
+        self.audits += audit
+        self.escalations += ambiguous
+        self.escalated = audit or ambiguous
+        if not self.escalated:
+            return [det for det in cheap_detections if det.score >= self.score_threshold]
+
+        self.expensive_runs += 1
+        start = time.monotonic()
+        expensive_detections = self.expensive.detect(img)
+        self.expensive_ms_total += (time.monotonic() - start) * 1000
+        self.preprocess_ms += self.expensive.preprocess_ms
+        self.inference_ms += self.expensive.inference_ms
+        self.postprocess_ms += self.expensive.postprocess_ms
+
+        # The expensive model decides; the cheap model only adds objects it was sure about
+        # that the expensive model didn't report at all
+        confident_cheap = [det for det in cheap_detections if det.score >= self.band_high]
+        expensive_kept = [det for det in expensive_detections if det.score >= self.score_threshold]
+        return merge_detections(expensive_kept, confident_cheap)
+
+    def detect_batch(self, imgs):
+        return [self.detect(img) for img in imgs]
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "escalation_rate": self.escalations / frames,
+            "audit_rate": self.audits / frames,
+            "avg_cost_ms_per_frame": (self.cheap_ms_total + self.expensive_ms_total) / frames,
+            "avg_cheap_ms": self.cheap_ms_total / frames,
+            "avg_expensive_ms": self.expensive_ms_total / self.expensive_runs if self.expensive_runs else 0.0,
+            "band": [self.band_low, self.band_high],
+            "audit_every": self.audit_every,
+        }
@@ -0,0 +1,132 @@
+# src/detectors.py
+# Detector wrappers with one common interface, so servers can hold a pool of them without
+# caring which backend is underneath:
+#
+#   detector.detect(img)           -> list of Detection for one BGR frame
+#   detector.detect_batch(imgs)    -> one list of Detection per frame
+#   detector.max_batch             -> how many frames detect_batch() can run in one call
+#
+# A detector instance is not thread-safe; give each worker thread its own.
+import os
+import time
+
+import numpy as np
+
+from pipeline_stages import Detection, preprocess_frame, read_ssd_outputs, ssd_postprocess
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
+DEFAULT_SSD_MODEL = os.path.join(MODELS_DIR, "ssd_mobilenet_v2.tflite")
+DEFAULT_YOLO_MODEL = os.path.join(MODELS_DIR, "yolov8n_ncnn_model")
+DEFAULT_LABELS = os.path.join(MODELS_DIR, "coco_labels.txt")
+
+
+def load_labels(labels_path=DEFAULT_LABELS):
+    with open(labels_path, 'r') as f:
+        return [line.strip() for line in f.readlines()]
+
+
+class SsdDetector:
+    """TFLite SSD MobileNet detector (the same model and post-processing as ssd.py)."""
+
+    # The TFLite detection post-processing op only supports a batch of one
+    max_batch = 1
+
+    def __init__(self, model_path=DEFAULT_SSD_MODEL, labels_path=DEFAULT_LABELS, num_threads=None, score_threshold=0.5, pool=None):
+        from tflite_runtime.interpreter import Interpreter
+
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self.pool = pool # Optional FrameBufferPool for the preprocessing buffers
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.input_height, self.input_width = self.input_details[0]['shape'][1:3]
+        self.input_shape = tuple(self.input_details[0]['shape'])
+        self.input_dtype = self.input_details[0]['dtype']
+        self.labels = load_labels(labels_path)
+
+        # Stage timings of the most recent detect() call, in milliseconds
+        self.preprocess_ms = 0.0
+        self.inference_ms = 0.0
+        self.postprocess_ms = 0.0
+
+    def detect(self, img):
+        start_preprocess_time = time.monotonic()
+        input_data = preprocess_frame(img, self.input_width, self.input_height, self.input_dtype, self.pool)
+        self.interpreter.set_tensor(self.input_details[0]['index'], input_data) # Copies into the input tensor
+        if self.pool:
+            self.pool.release(input_data)
+
+        start_inference_time = time.monotonic()
+        self.interpreter.invoke()
+        end_inference_time = time.monotonic()
+
+        im_h, im_w = img.shape[:2]
+        boxes, classes, scores, num_detections = read_ssd_outputs(self.interpreter, self.output_details)
+        detections = ssd_postprocess(boxes, classes, scores, num_detections, self.labels, im_w, im_h, self.score_threshold)
+        end_postprocess_time = time.monotonic()
+
+        self.preprocess_ms = (start_inference_time - start_preprocess_time) * 1000
+        self.inference_ms = (end_inference_time - start_inference_time) * 1000
+        self.postprocess_ms = (end_postprocess_time - end_inference_time) * 1000
+        return detections
+
+    def detect_batch(self, imgs):
+        return [self.detect(img) for img in imgs]
+
+
+class YoloDetector:
+    """Ultralytics YOLO detector (the model yolo.py uses).
+
+    Ultralytics accepts a list of frames and runs them as one batch, so set max_batch > 1 for
+    backends exported with a dynamic or larger batch dimension (the bundled NCNN export has batch 1).
+    """
+
+    def __init__(self, model_path=DEFAULT_YOLO_MODEL, max_batch=1, score_threshold=0.25):
+        from ultralytics import YOLO
+
+        self.model_path = model_path
+        self.model = YOLO(model_path)
+        self.max_batch = max_batch
+        self.score_threshold = score_threshold
+        self.input_shape = (max_batch, 640, 640, 3)  # What the bundled export was built for
+
+        self.preprocess_ms = 0.0
+        self.inference_ms = 0.0
+        self.postprocess_ms = 0.0
+
+    def detect(self, img):
+        return self.detect_batch([img])[0]
+
+    def detect_batch(self, imgs):
+        results = self.model(imgs, conf=self.score_threshold, verbose=False)
+        speed = results[0].speed  # Per-image averages reported by Ultralytics
+        self.preprocess_ms = speed.get("preprocess", 0.0)
+        self.inference_ms = speed.get("inference", 0.0)
+        self.postprocess_ms = speed.get("postprocess", 0.0)
+        return [self._to_detections(result) for result in results]
+
+    @staticmethod
+    def _to_detections(result):
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return []
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.int32)
+        scores = boxes.conf.cpu().numpy()
+        classes = boxes.cls.cpu().numpy().astype(np.int32)
+
+        detections = []
+        for (x1, y1, x2, y2), score, class_id in zip(xyxy, scores, classes):
+            label = result.names.get(int(class_id), "Unknown")
+            detections.append(Detection(label, int(class_id), float(score), int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+        return detections
+
+
+def create_detector(kind="ssd", **kwargs):
+    """Builds a detector by backend name ("ssd" or "yolo")."""
+    if kind == "ssd":
+        return SsdDetector(**kwargs)
+    if kind == "yolo":
+        return YoloDetector(**kwargs)
+    raise ValueError(f"Unknown detector kind: {kind}")
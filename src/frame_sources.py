@@ -0,0 +1,253 @@
+# src/frame_sources.py
+# Frame sources the streaming servers can pull from: the CSI camera, a USB camera, a replayed
+# video file / image folder, or a synthetic test pattern. All of them look the same:
+#
+#   source.start()
+#   frame, capture_time = source.read()   # BGR ndarray + time.monotonic() seconds; (None, None) at end
+#   source.close()
+#
+# read() blocks until the next frame is available, so call it from a worker thread
+# (asyncio.to_thread) when you're inside the event loop.
+#
+# Pass a FrameBufferPool (buffer_pool.py) as `pool` to have frames written into pooled buffers
+# instead of freshly allocated ones; the caller then releases each frame back to the pool.
+#
+# Sources are usually built from a short spec string with open_source():
+#   "csi" / "csi:1"            Picamera2 camera number 0 / 1
+#   "usb:0"                    /dev/video0 through OpenCV
+#   "replay:clip.mp4"          a video file, looped and paced to its own frame rate
+#   "replay:captured_media/"   a folder of .jpg/.png images, looped
+#   "synthetic"                a moving test pattern, no hardware needed
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+DEFAULT_SIZE = (1920, 1080)
+DEFAULT_FPS = 15.0
+
+
+class PicameraSource:
+    """A CSI camera through Picamera2. Frames are taken straight from the ISP, so no JPEG decode is needed."""
+
+    def __init__(self, camera_num=0, size=DEFAULT_SIZE, pool=None):
+        self.camera_num = camera_num
+        self.size = size
+        self.pool = pool
+        self.picam2 = None
+
+    def start(self):
+        from picamera2 import Picamera2
+
+        self.picam2 = Picamera2(self.camera_num)
+        video_config = self.picam2.create_video_configuration(
+            main={"size": self.size, "format": "RGB888"} # RGB888 is BGR byte order, i.e. what OpenCV expects
+        )
+        self.picam2.configure(video_config)
+        self.picam2.start()
+
+    def read(self):
+        request = self.picam2.capture_request()
+        try:
+            if self.pool:
+                from picamera2 import MappedArray
+
+                # Copy straight out of the camera's mapped buffer into a pooled frame
+                # (make_buffer() would allocate a full-frame copy of its own first)
+                width, height = self.size
+                frame = self.pool.acquire((height, width, 3))
+                with MappedArray(request, "main") as mapped:
+                    np.copyto(frame, mapped.array[:height, :width])
+            else:
+                frame = request.make_array("main")
+            sensor_timestamp_ns = request.get_metadata().get("SensorTimestamp")
+        finally:
+            request.release()
+        return frame, sensor_to_monotonic(sensor_timestamp_ns)
+
+    def close(self):
+        if self.picam2:
+            self.picam2.stop()
+            self.picam2.close()
+            self.picam2 = None
+
+
+def sensor_to_monotonic(sensor_timestamp_ns):
+    """Converts a libcamera SensorTimestamp (CLOCK_BOOTTIME nanoseconds) to time.monotonic() seconds."""
+    if sensor_timestamp_ns is None:
+        return time.monotonic()
+    age_s = time.clock_gettime(time.CLOCK_BOOTTIME) - sensor_timestamp_ns / 1e9
+    return time.monotonic() - max(0.0, age_s)
+
+
+class UsbCameraSource:
+    """A V4L2/USB camera through OpenCV."""
+
+    def __init__(self, device_index=0, size=DEFAULT_SIZE, pool=None):
+        self.device_index = device_index
+        self.size = size
+        self.pool = pool
+        self.capture = None
+
+    def start(self):
+        self.capture = cv2.VideoCapture(self.device_index)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Could not open USB camera {self.device_index}")
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1) # Don't let stale frames queue up in the driver
+
+    def read(self):
+        ok, frame = read_video_frame(self.capture, self.pool, self.size)
+        capture_time = time.monotonic()
+        if not ok:
+            return None, None
+        return frame, capture_time
+
+    def close(self):
+        if self.capture:
+            self.capture.release()
+            self.capture = None
+
+
+def read_video_frame(capture, pool, size):
+    """VideoCapture.read(), decoding into a pooled buffer when a pool is given."""
+    if pool is None:
+        return capture.read()
+    buffer = pool.acquire((size[1], size[0], 3))
+    ok, frame = capture.read(buffer)
+    if frame is not buffer:
+        pool.release(buffer) # Frame size differed from the expected one; OpenCV allocated a new array
+    return ok, frame
+
+
+class ReplaySource:
+    """Replays a video file or a folder of images at a fixed rate, looping forever by default.
+
+    The capture time of a replayed frame is the moment it was due to be shown, so downstream
+    latency measurements behave the same as with a live camera.
+    """
+
+    IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+    def __init__(self, path, fps=None, loop=True, pool=None):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.pool = pool
+        self.capture = None
+        self.size = None
+        self.image_paths = None
+        self.index = 0
+        self.next_frame_time = None
+
+    def start(self):
+        if os.path.isdir(self.path):
+            self.image_paths = sorted(
+                p for pattern in self.IMAGE_PATTERNS for p in glob.glob(os.path.join(self.path, pattern))
+            )
+            if not self.image_paths:
+                raise RuntimeError(f"No images found in {self.path}")
+        else:
+            self.capture = cv2.VideoCapture(self.path)
+            if not self.capture.isOpened():
+                raise RuntimeError(f"Could not open video file {self.path}")
+            if self.fps is None:
+                self.fps = self.capture.get(cv2.CAP_PROP_FPS) or None
+            self.size = (int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.fps = self.fps or DEFAULT_FPS
+        self.next_frame_time = time.monotonic()
+
+    def _next_frame(self):
+        if self.image_paths is not None:
+            if self.index >= len(self.image_paths):
+                if not self.loop:
+                    return None
+                self.index = 0
+            frame = cv2.imread(self.image_paths[self.index], cv2.IMREAD_COLOR)
+            self.index += 1
+            return frame
+
+        ok, frame = read_video_frame(self.capture, self.pool, self.size)
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = read_video_frame(self.capture, self.pool, self.size)
+        return frame if ok else None
+
+    def read(self):
+        delay = self.next_frame_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        capture_time = self.next_frame_time
+        # If the reader fell behind, resync instead of bursting frames to catch up
+        self.next_frame_time = max(self.next_frame_time + 1.0 / self.fps, time.monotonic())
+
+        frame = self._next_frame()
+        if frame is None:
+            return None, None
+        return frame, capture_time
+
+    def close(self):
+        if self.capture:
+            self.capture.release()
+            self.capture = None
+
+
+class SyntheticSource:
+    """A moving test pattern at a fixed rate; useful for load tests and development without a camera."""
+
+    def __init__(self, size=DEFAULT_SIZE, fps=DEFAULT_FPS, pool=None):
+        self.size = size
+        self.fps = fps
+        self.pool = pool
+        self.background = None
+        self.frame_number = 0
+        self.next_frame_time = None
+
+    def start(self):
+        width, height = self.size
+        gradient_x = np.linspace(0, 255, width, dtype=np.float32)
+        gradient_y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        self.background = np.empty((height, width, 3), dtype=np.uint8)
+        self.background[..., 0] = gradient_x * 0.6 + gradient_y * 0.4
+        self.background[..., 1] = gradient_y * 0.7
+        self.background[..., 2] = 255 - gradient_x * 0.5
+        self.next_frame_time = time.monotonic()
+
+    def read(self):
+        delay = self.next_frame_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        capture_time = self.next_frame_time
+        self.next_frame_time = max(self.next_frame_time + 1.0 / self.fps, time.monotonic())
+
+        width, height = self.size
+        box = min(width, height) // 5
+        x = int((self.frame_number * 8) % (width - box))
+        y = int((height - box) * (0.5 + 0.4 * np.sin(self.frame_number / 20.0)))
+        frame = self.pool.copy(self.background) if self.pool else self.background.copy()
+        cv2.rectangle(frame, (x, y), (x + box, y + box), (40, 40, 220), -1)
+        cv2.putText(frame, f"frame {self.frame_number}", (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        self.frame_number += 1
+        return frame, capture_time
+
+    def close(self):
+        self.background = None
+
+
+def open_source(spec, size=DEFAULT_SIZE, fps=None, pool=None):
+    """Builds a frame source from a spec string (see the top of this file)."""
+    kind, _, arg = spec.partition(":")
+    if kind == "csi":
+        return PicameraSource(int(arg or 0), size, pool)
+    if kind == "usb":
+        return UsbCameraSource(int(arg or 0), size, pool)
+    if kind == "replay":
+        if not arg:
+            raise ValueError("replay source needs a path, e.g. replay:clip.mp4")
+        return ReplaySource(arg, fps, pool=pool)
+    if kind == "synthetic":
+        return SyntheticSource(size, fps or DEFAULT_FPS, pool)
+    raise ValueError(f"Unknown frame source: {spec}")
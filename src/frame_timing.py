@@ -0,0 +1,124 @@
+# src/frame_timing.py
+# Capture timestamps, per-stage frame-age budgets and glass-to-send latency histograms.
+#
+# Every frame carries the time.monotonic() moment it was captured: the camera's SensorTimestamp
+# for the CSI camera (see frame_sources.sensor_to_monotonic), or the source's capture time for
+# USB/replay/synthetic sources. Before each expensive stage the streaming loop asks a
+# LatencyBudget whether the frame is still worth working on:
+#
+#   budget = LatencyBudget()                       # max age from TRACKER_MAX_FRAME_AGE_MS
+#   if budget.expired("inference", capture_time):  # records the age, counts the drop
+#       continue
+#   ...
+#   budget.record_sent(capture_time)               # glass-to-send latency
+#
+# For a live view a fresh frame is worth more than a complete sequence, so stale frames are
+# dropped as early as possible. To keep a slow model from starving the stream entirely (every
+# frame expiring during inference), a frame is never dropped once nothing has been sent for
+# longer than the budget itself.
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_MAX_FRAME_AGE_MS = 500.0
+# Upper bounds (ms) of the histogram buckets; the last bucket catches everything above
+HISTOGRAM_BUCKETS_MS = (10, 20, 35, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 2000)
+RECENT_SAMPLES = 1000
+
+
+def monotonic_to_wall(monotonic_time):
+    """Converts a time.monotonic() timestamp to wall-clock (time.time()) seconds."""
+    return time.time() - (time.monotonic() - monotonic_time)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram plus a window of recent samples for percentiles."""
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def add(self, value_ms):
+        index = len(HISTOGRAM_BUCKETS_MS)
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if value_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.recent.append(value_ms)
+        self.total += 1
+        self.sum_ms += value_ms
+
+    def percentile(self, fraction):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def stats(self):
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.total,
+            "mean_ms": self.sum_ms / self.total if self.total else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class LatencyBudget:
+    """Per-stage frame-age checks against a maximum age, and glass-to-send latency."""
+
+    def __init__(self, max_age_ms=None):
+        if max_age_ms is None:
+            max_age_ms = float(os.environ.get("TRACKER_MAX_FRAME_AGE_MS", DEFAULT_MAX_FRAME_AGE_MS))
+        self.max_age_s = max_age_ms / 1000 if max_age_ms > 0 else None # 0 disables dropping
+        self.lock = threading.Lock()
+        self.stage_ages = {}   # stage -> LatencyHistogram of frame age on arrival at that stage
+        self.dropped = {}      # stage -> frames dropped there
+        self.glass_to_send = LatencyHistogram()
+        self.last_sent_time = None
+
+    def expired(self, stage, capture_time):
+        """Records the frame's age at `stage`; returns True if the frame should be dropped."""
+        now = time.monotonic()
+        age_s = now - capture_time
+        with self.lock:
+            self.stage_ages.setdefault(stage, LatencyHistogram()).add(age_s * 1000)
+            if self.max_age_s is None or age_s <= self.max_age_s:
+                return False
+            # Starvation guard: better a late frame than a frozen view
+            if self.last_sent_time is None or now - self.last_sent_time > self.max_age_s:
+                return False
+            self.dropped[stage] = self.dropped.get(stage, 0) + 1
+            return True
+
+    def record_sent(self, capture_time):
+        """Records the glass-to-send latency of a frame that was just sent, and returns it (ms)."""
+        now = time.monotonic()
+        latency_ms = (now - capture_time) * 1000
+        with self.lock:
+            self.glass_to_send.add(latency_ms)
+            self.last_sent_time = now
+        return latency_ms
+
+    def summary(self):
+        with self.lock:
+            p95 = self.glass_to_send.percentile(0.95)
+            dropped = sum(self.dropped.values())
+        p95_str = f"{p95:.1f}ms" if p95 is not None else "n/a"
+        return f"glass-to-send p95 {p95_str}, {dropped} stale frames dropped"
+
+    def stats(self):
+        with self.lock:
+            return {
+                "max_age_ms": self.max_age_s * 1000 if self.max_age_s is not None else None,
+                "frames_sent": self.glass_to_send.total,
+                "dropped": dict(self.dropped),
+                "glass_to_send": self.glass_to_send.stats(),
+                "age_at_stage": {stage: histogram.stats() for stage, histogram in self.stage_ages.items()},
+            }
@@ -0,0 +1,215 @@
+# src/governor.py
+# Thermal- and CPU-aware inference governor.
+#
+# The Pi 4 firmware starts throttling the ARM clock at 80°C, and when it does the inference
+# latency jumps by 2-3x and stays there until the chip has cooled down, which shows up as a
+# sawtooth in metrics/*/performance_metrics.png. The governor sees this coming: it samples
+# the SoC temperature and CPU load and, as the temperature approaches the limit, gradually
+# lowers the inference duty cycle, so the chip settles below the firmware limit and
+# per-inference latency stays flat. When the cores are saturated while the temperature is
+# climbing, it starts backing off a few degrees earlier. (The interpreter's thread count isn't used as a lever:
+# TFLite fixes it when the interpreter is created, so changing it would mean reloading the
+# model mid-stream.)
+#
+# Frames that are skipped still get streamed, with the most recent detections drawn on them.
+#
+# The sensor source is pluggable: anything with read_temperature() and read_cpu_load()
+# works, e.g. SimulatedSensors below to reproduce a heat-up on a desk machine.
+import time
+
+
+class SysfsSensors:
+    """Reads SoC temperature from /sys and CPU load from /proc/stat (the same values the stats page shows)."""
+
+    def __init__(self, thermal_path="/sys/class/thermal/thermal_zone0/temp", stat_path="/proc/stat"):
+        self.thermal_path = thermal_path
+        self.stat_path = stat_path
+        self._last_cpu_times = None
+
+    def read_temperature(self):
+        """Returns the temperature in °C, or None if the sensor isn't available."""
+        try:
+            with open(self.thermal_path, 'r') as f:
+                return int(f.read().strip()) / 1000.0  # Reported in millidegrees
+        except (OSError, ValueError):
+            return None
+
+    def read_cpu_load(self):
+        """Returns per-core busy fractions (0.0-1.0) since the previous call, or None on the first call."""
+        try:
+            with open(self.stat_path, 'r') as f:
+                lines = [line.split() for line in f if line.startswith("cpu") and line[3].isdigit()]
+        except OSError:
+            return None
+
+        # user nice system idle iowait irq softirq steal
+        cpu_times = [[int(v) for v in fields[1:9]] for fields in lines]
+        previous, self._last_cpu_times = self._last_cpu_times, cpu_times
+        if previous is None or len(previous) != len(cpu_times):
+            return None
+
+        loads = []
+        for now, before in zip(cpu_times, previous):
+            total = sum(now) - sum(before)
+            idle = (now[3] + now[4]) - (before[3] + before[4])
+            loads.append(1.0 - idle / total if total > 0 else 0.0)
+        return loads
+
+
+class SimulatedSensors:
+    """A first-order thermal model for testing the governor without a Pi.
+
+    Temperature moves towards ambient + heat_rise * load with the given time constant, where
+    load is whatever the caller sets (e.g. the governor's own duty cycle). Pass clock to drive
+    it from simulated time instead of the wall clock.
+    """
+
+    def __init__(self, ambient_c=45.0, heat_rise_c=45.0, time_constant_s=60.0, cores=4, clock=time.monotonic):
+        self.ambient_c = ambient_c
+        self.heat_rise_c = heat_rise_c
+        self.time_constant_s = time_constant_s
+        self.cores = cores
+        self.clock = clock
+        self.load = 1.0
+        self.temperature = ambient_c
+        self._last_update = clock()
+
+    def _advance(self):
+        now = self.clock()
+        dt = now - self._last_update
+        self._last_update = now
+        target = self.ambient_c + self.heat_rise_c * self.load
+        self.temperature += (target - self.temperature) * min(1.0, dt / self.time_constant_s)
+
+    def read_temperature(self):
+        self._advance()
+        return self.temperature
+
+    def read_cpu_load(self):
+        return [self.load] * self.cores
+
+
+class InferenceGovernor:
+    """Decides which frames get inference, based on how close the SoC is to its thermal limit.
+
+    Below soft_limit_c every frame is inferred. Between soft_limit_c and hard_limit_c the
+    duty cycle (fraction of wall time spent in inference) is scaled down linearly towards
+    min_duty. The temperature used is smoothed and extrapolated lookahead_s ahead using its
+    current slope, and the duty cycle changes by at most max_step per sample, so the rate
+    eases down instead of stepping.
+
+    Sustained CPU load moves the start of the band down: when the cores have averaged more
+    than busy_load while the temperature is rising, the chip has no headroom left to absorb
+    the heat, so backing off starts up to load_margin_c earlier (at full load).
+    """
+
+    def __init__(self, sensors=None, soft_limit_c=70.0, hard_limit_c=78.0, min_duty=0.2,
+                 sample_interval_s=1.0, smoothing=0.3, lookahead_s=10.0, max_step=0.1,
+                 busy_load=0.8, load_margin_c=5.0, clock=time.monotonic):
+        self.sensors = sensors if sensors is not None else SysfsSensors()
+        self.soft_limit_c = soft_limit_c
+        self.hard_limit_c = hard_limit_c
+        self.min_duty = min_duty
+        self.sample_interval_s = sample_interval_s
+        self.smoothing = smoothing
+        self.lookahead_s = lookahead_s
+        self.max_step = max_step
+        self.busy_load = busy_load
+        self.load_margin_c = load_margin_c
+        self.clock = clock
+
+        self.duty = 1.0
+        self.temperature_c = None   # Smoothed temperature
+        self.slope_c_per_s = 0.0    # Smoothed rate of change
+        self.cpu_load = None        # Per-core load at the last sample
+        self.load_avg = None        # Smoothed mean load over all cores
+        self.skipped_frames = 0
+        self.inferred_frames = 0
+        self._last_sample = None
+        self._next_inference = 0.0
+
+    def sample(self):
+        """Reads the sensors (at most once per sample_interval_s) and updates the duty cycle."""
+        now = self.clock()
+        if self._last_sample is not None and now - self._last_sample < self.sample_interval_s:
+            return
+        dt = now - self._last_sample if self._last_sample is not None else None
+        self._last_sample = now
+
+        loads = self.sensors.read_cpu_load()
+        if loads:
+            self.cpu_load = loads
+            mean_load = sum(loads) / len(loads)
+            if self.load_avg is None:
+                self.load_avg = mean_load
+            else:
+                self.load_avg += self.smoothing * (mean_load - self.load_avg)
+
+        reading = self.sensors.read_temperature()
+        if reading is None:
+            return  # No thermal sensor: never throttle
+        if self.temperature_c is None:
+            self.temperature_c = reading
+        else:
+            previous = self.temperature_c
+            self.temperature_c += self.smoothing * (reading - self.temperature_c)
+            if dt:
+                slope = (self.temperature_c - previous) / dt
+                self.slope_c_per_s += self.smoothing * (slope - self.slope_c_per_s)
+
+        target = self._target_duty(self.predicted_temperature())
+        if abs(target - self.duty) <= self.max_step:
+            self.duty = target # Land exactly on the target, so full duty really is 1.0
+        else:
+            step = self.max_step if target > self.duty else -self.max_step
+            self.duty = min(1.0, max(self.min_duty, self.duty + step))
+
+    def predicted_temperature(self):
+        if self.temperature_c is None:
+            return None
+        # Only extrapolate upwards: a cooling chip shouldn't unthrottle before it is actually cool
+        return self.temperature_c + max(0.0, self.slope_c_per_s) * self.lookahead_s
+
+    def effective_soft_limit(self):
+        """soft_limit_c, lowered by up to load_margin_c while sustained high load heats the chip."""
+        if self.load_avg is None or self.slope_c_per_s <= 0 or self.load_avg <= self.busy_load:
+            return self.soft_limit_c
+        pressure = min(1.0, (self.load_avg - self.busy_load) / (1.0 - self.busy_load))
+        return self.soft_limit_c - self.load_margin_c * pressure
+
+    def _target_duty(self, temperature):
+        soft_limit_c = self.effective_soft_limit()
+        if temperature is None or temperature <= soft_limit_c:
+            return 1.0
+        if temperature >= self.hard_limit_c:
+            return self.min_duty
+        fraction = (temperature - soft_limit_c) / (self.hard_limit_c - soft_limit_c)
+        return 1.0 - fraction * (1.0 - self.min_duty)
+
+    def should_infer(self):
+        """True if this frame should run inference; False to reuse the previous detections."""
+        self.sample()
+        if self.clock() >= self._next_inference:
+            return True
+        self.skipped_frames += 1
+        return False
+
+    def record_inference(self, duration_s):
+        """Schedules the next inference so that inference takes up `duty` of wall time."""
+        self.inferred_frames += 1
+        idle_s = duration_s * (1.0 / self.duty - 1.0)
+        self._next_inference = self.clock() + idle_s
+
+    def status(self):
+        return {
+            "temperature_c": self.temperature_c,
+            "predicted_temperature_c": self.predicted_temperature(),
+            "cpu_load": self.cpu_load,
+            "cpu_load_avg": self.load_avg,
+            "duty_cycle": self.duty,
+            "soft_limit_c": self.soft_limit_c,
+            "effective_soft_limit_c": self.effective_soft_limit(),
+            "hard_limit_c": self.hard_limit_c,
+            "inferred_frames": self.inferred_frames,
+            "skipped_frames": self.skipped_frames,
+        }
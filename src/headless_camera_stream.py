@@ -1,6 +1,8 @@
 # src/headless_camera_stream.py
 import cv2
 from flask import Flask, Response
+import os
+import threading
 import time
 from picamera2 import Picamera2 # Import Picamera2
 import numpy as np # Needed for array manipulation
@@ -30,34 +32,150 @@ except Exception as e:
     # Exit if camera cannot be opened, as the app won't function without it.
     exit()
 
-def generate_frames():
-    """Generates frames from the camera for MJPEG streaming."""
-    while True:
+class FrameBroadcaster:
+    """Captures and encodes each frame once, and shares the JPEG with every connected client.
+
+    A single producer thread owns the camera. It publishes the latest JPEG together with a
+    sequence number, and client generators just wait for a sequence number newer than the one
+    they sent last. Slow clients skip frames instead of queueing them, and the encode cost no
+    longer grows with the number of viewers. The producer idles while nobody is watching.
+    """
+
+    STATS_INTERVAL_S = 10.0
+
+    def __init__(self, camera):
+        self.camera = camera
+        self.condition = threading.Condition()
+        self.chunk = None      # Latest frame as a complete multipart part, shared by all clients
+        self.sequence = 0
+        self.clients = 0
+        self.thread = None
+
+        # ⏱️ CPU cost accounting (seconds of thread CPU time)
+        self.producer_cpu_s = 0.0
+        self.produced_frames = 0
+        self.client_cpu = {}   # client id -> [cpu seconds, frames sent]
+        self.start_times = os.times()
+        self.process_times = {}  # stats() caller -> os.times() at its previous call
+        self.last_stats_time = time.monotonic()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._produce, name="frame-producer", daemon=True)
+            self.thread.start()
+
+    def _produce(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.clients > 0)
+            try:
+                cpu_start = time.thread_time()
+
+                # Capture a frame as a NumPy array (format: RGB888, as configured)
+                frame = self.camera.capture_array()
+
+                # Convert frame from RGB (Picamera2 output) to BGR (OpenCV default for encoding)
+                bgr_frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
+                # Encode the frame as JPEG and wrap it in its multipart headers, once for all clients
+                ret, buffer = cv2.imencode('.jpg', bgr_frame)
+                if not ret:
+                    print("Error: Failed to encode frame as JPEG.")
+                    continue
+                chunk = b''.join((b'--frame\r\nContent-Type: image/jpeg\r\n\r\n', buffer, b'\r\n'))
+
+                with self.condition:
+                    self.chunk = chunk
+                    self.sequence += 1
+                    self.producer_cpu_s += time.thread_time() - cpu_start
+                    self.produced_frames += 1
+                    self.condition.notify_all()
+
+                if time.monotonic() - self.last_stats_time >= self.STATS_INTERVAL_S:
+                    self._print_stats()
+            except Exception as e:
+                print(f"Error during frame generation: {e}")
+                time.sleep(1) # Wait a bit before retrying to prevent rapid error logging
+
+    def generate(self):
+        """Per-client generator: yields every new shared frame, never captures or encodes itself."""
+        client_id = object()
+        with self.condition:
+            self.clients += 1
+            self.client_cpu[client_id] = [0.0, 0]
+            self.condition.notify_all()
+        last_sequence = self.sequence
+        stats = self.client_cpu[client_id]
+        cpu_start = None
         try:
-            # Capture a frame as a NumPy array (format: RGB888, as configured)
-            frame = picam2.capture_array()
+            while True:
+                # Werkzeug writes the yielded chunk to the socket in this thread before resuming
+                # us, so the CPU time since the last yield includes sending the previous frame
+                if cpu_start is not None:
+                    stats[0] += time.thread_time() - cpu_start
+                    cpu_start = None
+                with self.condition:
+                    if not self.condition.wait_for(lambda: self.sequence != last_sequence, timeout=5.0):
+                        continue
+                    last_sequence = self.sequence
+                    chunk = self.chunk
+
+                cpu_start = time.thread_time() # Waiting for the next frame isn't counted
+                stats[1] += 1
+                yield chunk
+        finally:
+            # Runs when the browser disconnects and Flask closes the generator
+            with self.condition:
+                self.clients -= 1
+                del self.client_cpu[client_id]
+
+    def stats(self, caller="http"):
+        """Producer and per-client CPU per frame, plus whole-process CPU since this caller's previous call.
 
-            # Convert frame from RGB (Picamera2 output) to BGR (OpenCV default for encoding)
-            bgr_frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        Each caller (the periodic log, the /stats route) gets its own process CPU window, so
+        they don't shorten each other's.
+        """
+        now_times = os.times()
+        with self.condition:
+            previous = self.process_times.get(caller, self.start_times)
+            self.process_times[caller] = now_times
+            wall_s = now_times.elapsed - previous.elapsed
+            cpu_s = (now_times.user + now_times.system) - (previous.user + previous.system)
+            per_client_ms = [cpu / frames * 1000 for cpu, frames in self.client_cpu.values() if frames]
+            return {
+                "clients": self.clients,
+                "frames_produced": self.produced_frames,
+                "producer_cpu_ms_per_frame": self.producer_cpu_s / self.produced_frames * 1000 if self.produced_frames else 0.0,
+                "client_cpu_ms_per_frame": per_client_ms,
+                "process_cpu_percent": cpu_s / wall_s * 100 if wall_s > 0 else 0.0,
+            }
 
-            # Encode the frame as JPEG
-            ret, buffer = cv2.imencode('.jpg', bgr_frame)
-            if not ret:
-                print("Error: Failed to encode frame as JPEG.")
-                continue
+    def _print_stats(self):
+        self.last_stats_time = time.monotonic()
+        stats = self.stats(caller="log")
+        per_client = stats["client_cpu_ms_per_frame"]
+        avg_client_ms = sum(per_client) / len(per_client) if per_client else 0.0
+        print(f"{stats['clients']} client(s): producer {stats['producer_cpu_ms_per_frame']:.2f}ms CPU/frame, "
+              f"clients {avg_client_ms:.3f}ms CPU/frame each, process {stats['process_cpu_percent']:.0f}% CPU")
 
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        except Exception as e:
-            print(f"Error during frame generation: {e}")
-            time.sleep(1) # Wait a bit before retrying to prevent rapid error logging
+
+broadcaster = FrameBroadcaster(picam2)
+
+def generate_frames():
+    """Generates frames from the camera for MJPEG streaming."""
+    broadcaster.start()
+    return broadcaster.generate()
 
 @app.route('/video_feed')
 def video_feed():
     """Route to serve the MJPEG video stream."""
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/stats')
+def stats():
+    """CPU cost of the shared producer and of each connected client."""
+    return broadcaster.stats()
+
 @app.route('/')
 def index():
     """Simple HTML page to embed the video feed."""
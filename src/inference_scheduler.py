@@ -0,0 +1,223 @@
+# src/inference_scheduler.py
+# Shares a small pool of detectors between several camera streams.
+#
+# Each stream submits one frame at a time and awaits its detections. Worker threads (one per
+# detector) pick the next stream by stride scheduling: every stream has a pass value that
+# grows by 1/priority each time one of its frames is dispatched, and the pending stream with
+# the lowest pass goes next, so a priority-2 stream gets twice the turns of a priority-1 stream
+# without ever starving it. A stream that comes back after sitting out (a slow source, a
+# stopped stream) has its pass raised to the current minimum, so it can't bank turns.
+#
+# Since a stream only has one frame in flight, the stream that was just served is never
+# pending at the next pick: it's still drawing and sending its last frame. A lone free worker
+# therefore waits briefly for a stream with a lower pass whose next frame is due (twice its
+# usual turnaround, at most MAX_ANTICIPATION_S), rather than handing the detector to a stream
+# that is ahead. Without that, two streams would simply alternate whatever their priorities.
+#
+# Priority only matters under contention: when the pool keeps up with every stream, everyone
+# is served as fast as they submit. A stream with max_fps set isn't eligible again until
+# 1/max_fps after its last dispatch. Detectors with max_batch > 1 get frames from several
+# streams in one call.
+import asyncio
+import threading
+import time
+
+MAX_ANTICIPATION_S = 0.05
+TURNAROUND_SMOOTHING = 0.2
+
+
+class StreamSlot:
+    def __init__(self, name, priority=1, max_fps=None):
+        self.name = name
+        self.priority = max(1, int(priority))
+        self.max_fps = max_fps
+        self.pending = None          # (frame, future, loop, submit_time) waiting for a detector
+        self.pass_value = 0.0        # Stride scheduling: lowest pass goes next
+        self.last_dispatch = 0.0
+        self.in_flight = False
+        self.completed_at = None     # When the stream's last frame came back from the detector
+        self.turnaround_s = None     # Smoothed time from getting detections to submitting again
+
+        self.processed = 0
+        self.total_wait_s = 0.0
+        self.total_inference_s = 0.0
+
+    def next_eligible_time(self):
+        if not self.max_fps:
+            return self.last_dispatch
+        return self.last_dispatch + 1.0 / self.max_fps
+
+    def expected_by(self):
+        """When the next frame of a stream that's between frames should arrive, or None if not soon."""
+        if self.pending is not None or self.in_flight or self.completed_at is None:
+            return None
+        turnaround_s = self.turnaround_s if self.turnaround_s is not None else MAX_ANTICIPATION_S / 2
+        if turnaround_s > MAX_ANTICIPATION_S / 2:
+            return None # Slow to come back (e.g. a low frame-rate source); not worth holding a detector
+        expected = self.completed_at + 2 * turnaround_s
+        if self.next_eligible_time() > expected:
+            return None # Rate-capped; it couldn't be dispatched on arrival anyway
+        return expected
+
+    def stats(self):
+        return {
+            "priority": self.priority,
+            "max_fps": self.max_fps,
+            "processed": self.processed,
+            "avg_queue_wait_ms": self.total_wait_s / self.processed * 1000 if self.processed else 0.0,
+            "avg_inference_ms": self.total_inference_s / self.processed * 1000 if self.processed else 0.0,
+        }
+
+
+def _resolve(future, result=None, error=None):
+    if future.done():
+        return  # The waiting stream was cancelled
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class InferenceScheduler:
+    def __init__(self, detectors):
+        self.detectors = list(detectors)
+        self.slots = {}
+        self.condition = threading.Condition()
+        self.running = False
+        self.workers = []
+        self.idle_workers = 0
+        self.virtual_time = 0.0      # Pass of the last stream dispatched
+        self.batches = 0
+        self.batched_frames = 0
+
+    def register(self, name, priority=1, max_fps=None):
+        with self.condition:
+            self.slots[name] = StreamSlot(name, priority, max_fps)
+
+    def unregister(self, name):
+        with self.condition:
+            slot = self.slots.pop(name, None)
+        if slot and slot.pending:
+            _, future, loop, _ = slot.pending
+            loop.call_soon_threadsafe(_resolve, future, None)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        for i, detector in enumerate(self.detectors):
+            worker = threading.Thread(target=self._worker, args=(detector,), name=f"detector-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    async def submit(self, name, frame):
+        """Queues a frame for stream `name` and waits for its detections."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.condition:
+            slot = self.slots[name]
+            if slot.pending is not None:
+                raise RuntimeError(f"Stream {name} already has a frame waiting for inference")
+            now = time.monotonic()
+            if slot.completed_at is not None:
+                turnaround_s = now - slot.completed_at
+                if slot.turnaround_s is None:
+                    slot.turnaround_s = turnaround_s
+                else:
+                    slot.turnaround_s += TURNAROUND_SMOOTHING * (turnaround_s - slot.turnaround_s)
+            slot.pass_value = max(slot.pass_value, self.virtual_time)
+            slot.pending = (frame, future, loop, now)
+            self.condition.notify()
+        return await future
+
+    def _pick_batch(self, max_batch, now):
+        """Picks up to max_batch streams, lowest pass first. Caller holds the lock.
+
+        Returns (batch, wait_until): an empty batch with wait_until set means a stream with a
+        lower pass is expected back shortly and the worker should wait for it.
+        """
+        eligible = sorted(
+            (slot for slot in self.slots.values() if slot.pending is not None and now >= slot.next_eligible_time()),
+            key=lambda slot: slot.pass_value,
+        )
+        if not eligible:
+            return [], None
+        if self.idle_workers == 0: # Otherwise the other free worker can take that stream when it's back
+            expected = [slot.expected_by() for slot in self.slots.values() if slot.pass_value < eligible[0].pass_value]
+            expected = [t for t in expected if t is not None and t > now]
+            if expected:
+                return [], min(expected)
+
+        batch = eligible[:max_batch]
+        self.virtual_time = batch[0].pass_value
+        for slot in batch:
+            slot.pass_value += 1.0 / slot.priority
+        return batch, None
+
+    def _next_wakeup(self, now):
+        """Seconds until a rate-capped stream with a pending frame becomes eligible. Caller holds the lock."""
+        waits = [slot.next_eligible_time() - now for slot in self.slots.values() if slot.pending is not None]
+        return max(0.0, min(waits)) if waits else None
+
+    def _worker(self, detector):
+        while True:
+            with self.condition:
+                while True:
+                    if not self.running:
+                        return
+                    now = time.monotonic()
+                    batch, wait_until = self._pick_batch(detector.max_batch, now)
+                    if batch:
+                        break
+                    timeout = wait_until - now if wait_until is not None else self._next_wakeup(now)
+                    self.idle_workers += 1
+                    self.condition.wait(timeout=timeout)
+                    self.idle_workers -= 1
+
+                jobs = []
+                for slot in batch:
+                    frame, future, loop, submit_time = slot.pending
+                    slot.pending = None
+                    slot.in_flight = True
+                    slot.last_dispatch = now
+                    slot.total_wait_s += now - submit_time
+                    jobs.append((slot, frame, future, loop))
+
+            start = time.monotonic()
+            try:
+                if len(jobs) == 1:
+                    results = [detector.detect(jobs[0][1])]
+                else:
+                    results = detector.detect_batch([frame for _, frame, _, _ in jobs])
+                error = None
+            except Exception as e:
+                results, error = [None] * len(jobs), e
+            elapsed = time.monotonic() - start
+
+            with self.condition:
+                self.batches += 1
+                self.batched_frames += len(jobs)
+                done = time.monotonic()
+                for slot, _, _, _ in jobs:
+                    slot.processed += 1
+                    slot.total_inference_s += elapsed
+                    slot.in_flight = False
+                    slot.completed_at = done
+            for (_, _, future, loop), result in zip(jobs, results):
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+
+    def stats(self):
+        with self.condition:
+            return {
+                "detectors": len(self.detectors),
+                "avg_batch_size": self.batched_frames / self.batches if self.batches else 0.0,
+                "streams": {name: slot.stats() for name, slot in self.slots.items()},
+            }
@@ -0,0 +1,236 @@
+# src/load_test.py
+# WebSocket load test for the streaming servers.
+#
+# Starts ssd.py or yolo.py under uvicorn with a synthetic (or replayed) frame source, then
+# connects N simulated viewers for each N in --clients and measures, per client:
+#   * delivered FPS
+#   * inter-frame gap jitter (standard deviation and p95 of the gaps)
+#   * frame age (time from capture to arrival, from the timestamp the server embeds in each JPEG)
+# together with the server process' CPU usage during each step.
+#
+#   python src/load_test.py --server ssd --source synthetic --clients 1 5 10 20 50
+#   python src/load_test.py --server yolo --source replay:captured_media/test_video.mp4 --slow-fraction 0.2
+#
+# Some clients can be made slow readers (--slow-fraction, --slow-delay-ms), which pause after
+# every frame like a browser on a weak connection would; this shows whether one slow viewer
+# drags everybody else down. Results are printed and saved to metrics/load_test/.
+import argparse
+import asyncio
+import csv
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+from pipeline_stages import read_jpeg_stamp
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(SRC_DIR, "..", "metrics", "load_test")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def process_cpu_seconds(pid):
+    """User + system CPU seconds used so far by a process, from /proc/<pid>/stat."""
+    with open(f"/proc/{pid}/stat", 'r') as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # Fields after "(comm)": state is [0], utime is [11], stime is [12]
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class MeasureWindow:
+    """The measured part of a step (time.time() seconds), shared by the clients and the CPU sampling."""
+
+    def __init__(self):
+        self.start = None
+        self.end = None
+
+    def contains(self, t):
+        return self.start is not None and t >= self.start and (self.end is None or t < self.end)
+
+    @property
+    def duration_s(self):
+        return self.end - self.start
+
+
+class ClientStats:
+    def __init__(self, client_id, delay_s):
+        self.client_id = client_id
+        self.delay_s = delay_s
+        self.arrivals = []
+        self.ages_ms = []
+        self.bytes = 0
+        self.error = None
+
+    def summary(self, duration_s):
+        gaps_ms = [(b - a) * 1000 for a, b in zip(self.arrivals, self.arrivals[1:])]
+        return {
+            "client": self.client_id,
+            "reader": "slow" if self.delay_s else "fast",
+            "frames": len(self.arrivals),
+            "fps": len(self.arrivals) / duration_s,
+            "gap_mean_ms": statistics.fmean(gaps_ms) if gaps_ms else 0.0,
+            "gap_jitter_ms": statistics.pstdev(gaps_ms) if len(gaps_ms) > 1 else 0.0,
+            "gap_p95_ms": percentile(gaps_ms, 0.95),
+            "age_mean_ms": statistics.fmean(self.ages_ms) if self.ages_ms else 0.0,
+            "age_p95_ms": percentile(self.ages_ms, 0.95),
+            "mbit_per_s": self.bytes * 8 / duration_s / 1e6,
+            "error": self.error or "",
+        }
+
+
+async def run_client(url, stats, stop_event, window):
+    try:
+        async with websockets.connect(url, max_size=None) as websocket:
+            while not stop_event.is_set():
+                try:
+                    message = await asyncio.wait_for(websocket.recv(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                now = time.time()
+                if window.contains(now):
+                    stats.arrivals.append(now)
+                    stats.bytes += len(message)
+                    capture_time = read_jpeg_stamp(message)
+                    if capture_time is not None:
+                        stats.ages_ms.append((now - capture_time) * 1000)
+                if stats.delay_s:
+                    await asyncio.sleep(stats.delay_s)
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+
+
+def post(base_url, path):
+    request = urllib.request.Request(base_url + path, method="POST", data=b"")
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+
+
+async def run_step(args, base_url, ws_url, num_clients, server_pid):
+    slow_count = int(round(num_clients * args.slow_fraction))
+    stop_event = asyncio.Event()
+    window = MeasureWindow()
+    clients = [
+        ClientStats(i, args.slow_delay_ms / 1000 if i < slow_count else 0.0)
+        for i in range(num_clients)
+    ]
+    tasks = [asyncio.create_task(run_client(ws_url, stats, stop_event, window)) for stats in clients]
+
+    await asyncio.sleep(0.5) # Let every client connect before the stream starts
+    await asyncio.to_thread(post, base_url, args.start_path)
+
+    # Frames and CPU are measured over the same window, which starts only after the stream is up
+    # (the first /start also loads the model) and the warmup has passed
+    await asyncio.sleep(args.warmup)
+    cpu_start, window.start = process_cpu_seconds(server_pid) if server_pid else None, time.time()
+    await asyncio.sleep(args.duration)
+    cpu_end, window.end = process_cpu_seconds(server_pid) if server_pid else None, time.time()
+
+    stop_event.set()
+    await asyncio.gather(*tasks)
+    # The servers stop the stream when the last viewer leaves; give it time to shut down
+    await asyncio.sleep(args.cooldown)
+
+    server_cpu = (cpu_end - cpu_start) / window.duration_s * 100 if server_pid else None
+    return [stats.summary(window.duration_s) for stats in clients], server_cpu
+
+
+def start_server(args):
+    env = dict(os.environ)
+    env["TRACKER_SOURCE"] = args.source
+    env["TRACKER_STAMP_FRAMES"] = "1"
+    command = [sys.executable, "-m", "uvicorn", f"{args.server}:app", "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"]
+    server = subprocess.Popen(command, cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode} during startup")
+        try:
+            urllib.request.urlopen(base_url + "/docs", timeout=1).read()
+            return server, base_url
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Server did not come up in time")
+
+
+def print_step(num_clients, summaries, server_cpu):
+    fps = [s["fps"] for s in summaries]
+    jitter = [s["gap_jitter_ms"] for s in summaries]
+    ages = [s["age_mean_ms"] for s in summaries]
+    errors = sum(1 for s in summaries if s["error"])
+    cpu_str = f"{server_cpu:6.1f}%" if server_cpu is not None else "    n/a"
+    print(f"{num_clients:>4} clients | fps min {min(fps):5.1f} mean {statistics.fmean(fps):5.1f} | "
+          f"jitter mean {statistics.fmean(jitter):6.1f}ms | age mean {statistics.fmean(ages):7.1f}ms "
+          f"max {max(ages):7.1f}ms | server CPU {cpu_str} | errors {errors}")
+
+
+def save_results(rows):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"load_test_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+    with open(path, "w", newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved per-client results to: {path}")
+
+
+async def main_async(args):
+    server = None
+    server_pid = args.server_pid
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        server, base_url = start_server(args)
+        server_pid = server.pid
+    ws_url = base_url.replace("http://", "ws://", 1) + args.ws_path
+
+    rows = []
+    try:
+        for num_clients in args.clients:
+            summaries, server_cpu = await run_step(args, base_url, ws_url, num_clients, server_pid)
+            print_step(num_clients, summaries, server_cpu)
+            for summary in summaries:
+                rows.append({"clients": num_clients, "server_cpu_percent": server_cpu, **summary})
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    if rows:
+        save_results(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the WebSocket streaming server with N simulated viewers.")
+    parser.add_argument("--server", default="ssd", help="Server module to launch (ssd, yolo, ...)")
+    parser.add_argument("--source", default="synthetic", help="Frame source spec, e.g. synthetic or replay:clip.mp4")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="Use an already running server at this base URL instead of launching one")
+    parser.add_argument("--server-pid", type=int, help="PID of the server given with --url, for CPU measurement")
+    parser.add_argument("--ws-path", default="/ws")
+    parser.add_argument("--start-path", default="/start")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 5, 10, 20, 50])
+    parser.add_argument("--duration", type=float, default=15.0, help="Measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds at the start of each step")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="Pause between steps")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="Fraction of clients that read slowly")
+    parser.add_argument("--slow-delay-ms", type=float, default=200.0, help="Pause after each frame for slow clients")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# src/metrics_report.py
+# Offline report for the metrics the streaming servers record with metrics_store.py.
+#
+#   python src/metrics_report.py ssd                  # latest ssd run
+#   python src/metrics_report.py yolo --last 3        # the last three yolo runs, overlaid
+#   python src/metrics_report.py metrics/ssd/runs/20250101_120000 metrics/ssd/runs/20250102_080000
+#
+# Writes inference_metrics.csv, fps_metrics.csv and performance_metrics.png to metrics/<server>/
+# (or --out) and prints a short summary per run. Long runs are downsampled for the plot only;
+# the CSVs keep every sample.
+import argparse
+import csv
+import os
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from metrics_store import METRICS_ROOT, list_runs, load_run
+
+MODEL_NAMES = {"ssd": "SSD MobileNet V2", "yolo": "YOLO V8"}
+MAX_PLOT_POINTS = 5000
+
+
+def resolve_runs(specs, last):
+    """Turns server names ("ssd") and run directories into a list of run directories."""
+    directories = []
+    for spec in specs:
+        if os.path.isdir(spec):
+            directories.append(spec)
+            continue
+        runs = list_runs(spec)
+        if not runs:
+            raise SystemExit(f"No recorded runs for '{spec}' (looked in {os.path.join(METRICS_ROOT, spec, 'runs')})")
+        directories.extend(runs[-last:])
+    return directories
+
+
+def downsample(t, values, max_points=MAX_PLOT_POINTS):
+    """Averages consecutive samples so at most max_points are plotted."""
+    if len(t) <= max_points:
+        return t, values
+    edges = np.linspace(0, len(t), max_points + 1).astype(int)[:-1]
+    counts = np.diff(np.append(edges, len(t)))
+    return np.add.reduceat(t, edges) / counts, np.add.reduceat(values, edges) / counts
+
+
+def summarize(name, run):
+    series = run["series"]
+    parts = [name]
+    for key, label in (("inference_ms", "inference"), ("total_ms", "frame"), ("glass_to_send_ms", "glass-to-send")):
+        if key in series and len(series[key][1]):
+            values = series[key][1]
+            parts.append(f"{label} mean {values.mean():.1f}ms p95 {np.percentile(values, 95):.1f}ms")
+    if "fps" in series and len(series["fps"][1]):
+        parts.append(f"FPS mean {series['fps'][1].mean():.1f}")
+    if series:
+        duration = max((t[-1] for t, _ in series.values() if len(t)), default=0.0)
+        parts.append(f"{duration / 60:.1f} min")
+    print(" | ".join(parts))
+
+
+def write_csvs(out_dir, runs):
+    inference_csv_path = os.path.join(out_dir, "inference_metrics.csv")
+    with open(inference_csv_path, "w", newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Run", "Frame", "Time (s)", "Inference Latency (ms)"])
+        for name, run in runs:
+            t, values = run["series"].get("inference_ms", ((), ()))
+            for i, (ti, latency) in enumerate(zip(t, values)):
+                writer.writerow([name, i, f"{ti:.3f}", f"{latency:.3f}"])
+    print(f"Saved inference metrics to: {inference_csv_path}")
+
+    fps_csv_path = os.path.join(out_dir, "fps_metrics.csv")
+    with open(fps_csv_path, "w", newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Run", "Second", "FPS"])
+        for name, run in runs:
+            t, values = run["series"].get("fps", ((), ()))
+            for ti, fps in zip(t, values):
+                writer.writerow([name, f"{ti:.1f}", f"{fps:.3f}"])
+    print(f"Saved FPS metrics to: {fps_csv_path}")
+
+
+def plot(out_dir, runs):
+    model_name = MODEL_NAMES.get(runs[0][1]["server"], runs[0][1]["server"])
+    panels = [("inference_ms", "Inference Latency (ms)", f"Inference Latency ({model_name})"),
+              ("fps", "Frames per Second", f"FPS Over Time ({model_name})")]
+    if any("glass_to_send_ms" in run["series"] for _, run in runs):
+        panels.append(("glass_to_send_ms", "Latency (ms)", "Glass-to-Send Latency"))
+
+    performance_plot_path = os.path.join(out_dir, "performance_metrics.png")
+    plt.figure(figsize=(6 * len(panels), 5))
+    for i, (key, ylabel, title) in enumerate(panels, start=1):
+        plt.subplot(1, len(panels), i)
+        for name, run in runs:
+            if key in run["series"]:
+                t, values = downsample(*run["series"][key])
+                plt.plot(t, values, label=name if len(runs) > 1 else ylabel)
+        plt.xlabel("Time (seconds)")
+        plt.ylabel(ylabel)
+        plt.title(title)
+        plt.grid(True)
+        plt.legend()
+    plt.tight_layout()
+    plt.savefig(performance_plot_path)
+    plt.close()
+    print(f"Saved performance plot to: {performance_plot_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build plots and CSVs from recorded metrics runs.")
+    parser.add_argument("runs", nargs="+", help="Server names (ssd, yolo) for their latest runs, or run directories")
+    parser.add_argument("--last", type=int, default=1, help="How many of the latest runs to include per server name")
+    parser.add_argument("--out", help="Output directory (default: metrics/<server>/)")
+    args = parser.parse_args()
+
+    runs = [(os.path.basename(os.path.normpath(d)), load_run(d)) for d in resolve_runs(args.runs, args.last)]
+    for name, run in runs:
+        summarize(name, run)
+
+    out_dir = args.out or os.path.join(METRICS_ROOT, runs[0][1]["server"])
+    os.makedirs(out_dir, exist_ok=True)
+    write_csvs(out_dir, runs)
+    plot(out_dir, runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# src/metrics_store.py
+# Append-only on-disk time series for the streaming servers' metrics.
+#
+# The servers call recorder.record("inference_ms", 12.3) from the frame loop; that only appends a
+# tuple to an in-memory buffer. A background thread wakes up once a second and writes everything
+# buffered so far in one bulk write, so the loop never waits on the SD card and a crash loses at
+# most the last second.
+#
+# Layout of one run (one start/stop of a stream):
+#
+#   metrics/<server>/runs/<YYYYmmdd_HHMMSS>/
+#       run.json            server name, start time, and the series names in id order
+#       segment-0000.bin    fixed-size little-endian records: t (float64 seconds since the
+#       segment-0001.bin    run started), series id (uint16), value (float32) -- 14 bytes each
+#
+# A new segment is started once the current one reaches max_segment_mb, so multi-day runs stay
+# in manageable files. Read a run back with load_run(); metrics_report.py builds the plots and
+# CSVs from it.
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([("t", "<f8"), ("series", "<u2"), ("value", "<f4")])
+METRICS_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "metrics")
+
+
+def runs_dir(server):
+    return os.path.join(METRICS_ROOT, server, "runs")
+
+
+def new_run_directory(server, started_at):
+    """metrics/<server>/runs/<timestamp>, with a suffix if a run already started in that second."""
+    base = os.path.join(runs_dir(server), time.strftime("%Y%m%d_%H%M%S", time.localtime(started_at)))
+    directory, suffix = base, 1
+    while os.path.exists(directory):
+        directory = f"{base}_{suffix}"
+        suffix += 1
+    return directory
+
+
+class MetricsRecorder:
+    def __init__(self, server, directory=None, flush_interval_s=1.0, max_segment_mb=32):
+        self.server = server
+        self.started_at = time.time()
+        self.started_monotonic = time.monotonic()
+        self.directory = directory or new_run_directory(server, self.started_at)
+        self.flush_interval_s = flush_interval_s
+        self.max_segment_bytes = int(max_segment_mb * 1e6)
+
+        self.series_ids = {}
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+
+        self.segment_index = 0
+        self.segment_file = None
+        self.segment_bytes = 0
+        self.records_written = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_header()
+        self.thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self.thread.start()
+
+    def record(self, series, value, timestamp=None):
+        """Queues one sample. `timestamp` is a time.monotonic() value; defaults to now."""
+        t = (timestamp if timestamp is not None else time.monotonic()) - self.started_monotonic
+        with self.lock:
+            series_id = self.series_ids.get(series)
+            if series_id is None:
+                series_id = self.series_ids[series] = len(self.series_ids)
+                new_series = True
+            else:
+                new_series = False
+            self.buffer.append((t, series_id, value))
+        if new_series:
+            self._write_header()
+
+    def close(self):
+        """Flushes what's buffered and stops the writer thread."""
+        if self.closed:
+            return
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join()
+
+    def _write_header(self):
+        with self.lock:
+            series = sorted(self.series_ids, key=self.series_ids.get)
+        header = {
+            "server": self.server,
+            "started_at": self.started_at,
+            "record_format": "t:<f8, series:<u2, value:<f4",
+            "series": series,
+        }
+        # Write-then-rename, so a crash never leaves a half-written header behind
+        path = os.path.join(self.directory, "run.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(header, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def _run(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval_s)
+            self._flush()
+        self._flush()
+        if self.segment_file:
+            self.segment_file.close()
+            self.segment_file = None
+
+    def _flush(self):
+        with self.lock:
+            pending, self.buffer = self.buffer, []
+        if not pending:
+            return
+        data = np.array(pending, dtype=RECORD_DTYPE).tobytes()
+        if self.segment_file is None or self.segment_bytes >= self.max_segment_bytes:
+            self._open_next_segment()
+        self.segment_file.write(data)
+        self.segment_file.flush()
+        self.segment_bytes += len(data)
+        self.records_written += len(pending)
+
+    def _open_next_segment(self):
+        if self.segment_file:
+            self.segment_file.close()
+            self.segment_index += 1
+        path = os.path.join(self.directory, f"segment-{self.segment_index:04d}.bin")
+        self.segment_file = open(path, "ab")
+        self.segment_bytes = self.segment_file.tell()
+
+    def stats(self):
+        with self.lock:
+            buffered = len(self.buffer)
+        return {
+            "directory": os.path.abspath(self.directory),
+            "series": list(self.series_ids),
+            "records_written": self.records_written,
+            "records_buffered": buffered,
+            "segment": self.segment_index,
+        }
+
+
+def load_run(directory):
+    """Reads a run back as {"server", "started_at", "series": {name: (t, values)}}.
+
+    A segment cut short by a crash is read up to its last complete record.
+    """
+    with open(os.path.join(directory, "run.json"), 'r') as f:
+        header = json.load(f)
+
+    chunks = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("segment-") and name.endswith(".bin"):
+            with open(os.path.join(directory, name), 'rb') as f:
+                raw = f.read()
+            usable = len(raw) - len(raw) % RECORD_DTYPE.itemsize
+            chunks.append(np.frombuffer(raw[:usable], dtype=RECORD_DTYPE))
+    records = np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD_DTYPE)
+
+    series = {}
+    for series_id, name in enumerate(header["series"]):
+        selected = records[records["series"] == series_id]
+        series[name] = (selected["t"].astype(np.float64), selected["value"].astype(np.float64))
+    return {"server": header["server"], "started_at": header["started_at"], "series": series}
+
+
+def list_runs(server):
+    """Run directories of a server, oldest first."""
+    root = runs_dir(server)
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, name) for name in sorted(os.listdir(root))
+            if os.path.exists(os.path.join(root, name, "run.json"))]
@@ -0,0 +1,217 @@
+# src/model_reload.py
+# Swapping the detector of a running stream without stopping it.
+#
+# A reload goes through these states:
+#
+#   loading     the new detector is built in a worker thread (the stream keeps using the old one)
+#   warming     a few inferences on a recent camera frame, so the first live frame doesn't pay
+#               for lazy allocations; an exception here fails the reload
+#   staged      waiting for the frame loop to pick it up at the next frame boundary (with the
+#               stream stopped, that's when it starts again); a newer reload replaces it
+#   probation   live on the stream; its inference latency is compared with the old model's.
+#               If the stream stops mid-probation, a new reload may start after
+#               PROBATION_STALL_S. The live model keeps being judged until the new one is
+#               swapped in, and rollbacks still go to the last model that passed
+#   promoted    kept, or
+#   rolled_back the old detector is back because the new one raised, or its median latency
+#               exceeded the old median by more than max_regression
+#   failed      building or warming up failed; the old detector never stopped running
+#
+# The frame loop only has to do two things:
+#
+#   self.detector = self.model_reloader.swap(self.detector)   # once per frame, before inference
+#   self.model_reloader.record_inference(inference_ms)        # after each inference
+#
+# Everything else (building, warming, judging) happens off the loop.
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+DEFAULT_MAX_REGRESSION = 0.25
+BASELINE_FRAMES = 50
+PROBATION_STALL_S = 10.0
+
+
+class ModelReloader:
+    def __init__(self, warmup_runs=3, probation_frames=30, max_regression=DEFAULT_MAX_REGRESSION):
+        self.warmup_runs = warmup_runs
+        self.probation_frames = probation_frames
+        self.max_regression = max_regression            # Threshold for the model on probation
+        self.requested_max_regression = max_regression  # Threshold for the next one swapped in
+
+        self.state = "idle"
+        self.message = None
+        self.config = None           # What the current reload was asked to load
+        self.active_config = None    # What the detector in use was built from (after promotion)
+        self.task = None
+        self.lock = threading.Lock()
+
+        self.staged = None           # Warmed-up detector waiting for the next frame boundary
+        self.previous = None         # Detector to roll back to during probation
+        self.on_probation = False    # The detector in use is still being judged (see record_inference)
+        self.probation_config = None
+        self.rollback_requested = False
+        self.rollback_reason = None
+        self.recent_ms = deque(maxlen=BASELINE_FRAMES)  # Latencies of the detector in use
+        self.baseline_ms = None
+        self.probation_ms = []
+        self.last_probation_activity = None
+        self.warmup_ms = None
+        self.load_s = None
+
+        self.latest_frame = None
+        self.wants_frame = threading.Event()
+
+    @property
+    def busy(self):
+        if self.state in ("loading", "warming"):
+            return True
+        if self.state == "probation": # Unless the stream stopped and can't finish judging it
+            return time.monotonic() - self.last_probation_activity < PROBATION_STALL_S
+        return False
+
+    def start_reload(self, build, config, max_regression=None):
+        """Starts building `build()` in the background. Must be called from the event loop."""
+        if self.busy:
+            raise RuntimeError(f"A reload is already in progress ({self.state})")
+        with self.lock:
+            if self.staged is not None:
+                print(f"Model reload: dropping staged {self.config}, replaced by {config}")
+            self.staged = None
+            # A stalled probation isn't reset: if frames arrive before the new model is ready, the
+            # live one is still promoted or rolled back, and a failed reload leaves it on probation
+            self.state = "loading"
+        self.config = config
+        if max_regression is not None:
+            self.requested_max_regression = max_regression
+        self.message = None
+        self.warmup_ms = None
+        self.load_s = None
+        self.task = asyncio.create_task(self._load(build))
+
+    async def _load(self, build):
+        try:
+            start = time.monotonic()
+            candidate = await asyncio.to_thread(build)
+            self.load_s = time.monotonic() - start
+
+            self.state = "warming"
+            frame = await self._warmup_frame()
+            self.warmup_ms = await asyncio.to_thread(self._warm_up, candidate, frame)
+        except Exception as e:
+            self.state = "failed"
+            self.message = f"{type(e).__name__}: {str(e).strip()}"
+            print(f"Model reload failed, keeping the current model: {self.message}")
+            return
+
+        with self.lock:
+            self.staged = candidate
+            self.state = "staged"
+        print(f"Model reload: {self.config} loaded in {self.load_s:.1f}s, warmup {self.warmup_ms:.1f}ms; swapping in")
+
+    async def _warmup_frame(self, timeout_s=2.0):
+        """A recent frame from the running stream, or a blank 1080p frame if none arrives."""
+        self.wants_frame.set()
+        deadline = time.monotonic() + timeout_s
+        while self.latest_frame is None and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self.wants_frame.clear()
+        frame, self.latest_frame = self.latest_frame, None
+        return frame if frame is not None else np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    def _warm_up(self, candidate, frame):
+        timings = []
+        for _ in range(self.warmup_runs):
+            start = time.monotonic()
+            detections = candidate.detect(frame)
+            timings.append((time.monotonic() - start) * 1000)
+            if not isinstance(detections, list):
+                raise TypeError(f"detect() returned {type(detections).__name__}, expected a list of detections")
+        return min(timings)
+
+    def offer_frame(self, img):
+        """Called by the frame loop; keeps a copy of the frame only while a warmup is waiting for one."""
+        if self.wants_frame.is_set() and self.latest_frame is None:
+            self.latest_frame = img.copy()
+
+    def swap(self, current):
+        """Returns the detector the frame loop should use for the next frame."""
+        with self.lock:
+            if self.rollback_requested:
+                current, self.previous = self.previous, None
+                self.on_probation = False
+                self.rollback_requested = False
+                self.recent_ms.clear()
+                if self.state == "probation": # Otherwise a newer reload is under way; its state stays
+                    self.state = "rolled_back"
+                    self.message = self.rollback_reason
+                print(f"Model reload rolled back {self.probation_config}: {self.rollback_reason}")
+            if self.staged is not None:
+                if self.previous is None:
+                    self.previous = current
+                    if self.recent_ms: # After a rollback the last model that passed keeps its baseline
+                        self.baseline_ms = statistics.median(self.recent_ms)
+                # else it replaces a model whose probation never finished; the rollback target
+                # and baseline stay those of the last model that passed
+                current = self.staged
+                self.staged = None
+                self.on_probation = True
+                self.probation_config = self.config
+                self.max_regression = self.requested_max_regression
+                self.probation_ms = []
+                self.last_probation_activity = time.monotonic()
+                self.recent_ms.clear()
+                self.state = "probation"
+        return current
+
+    def record_inference(self, inference_ms):
+        self.recent_ms.append(inference_ms)
+        if not self.on_probation or self.rollback_requested:
+            return
+        self.last_probation_activity = time.monotonic()
+        self.probation_ms.append(inference_ms)
+        if len(self.probation_ms) < self.probation_frames:
+            return
+
+        median_ms = statistics.median(self.probation_ms)
+        if self.baseline_ms is not None and median_ms > self.baseline_ms * (1 + self.max_regression):
+            self._request_rollback(f"median inference {median_ms:.1f}ms vs {self.baseline_ms:.1f}ms before "
+                                   f"(allowed +{self.max_regression:.0%})")
+            return
+        self.previous = None
+        self.on_probation = False
+        self.active_config = self.probation_config
+        if self.state == "probation":
+            self.state = "promoted"
+        baseline_str = f"{self.baseline_ms:.1f}ms" if self.baseline_ms is not None else "n/a"
+        print(f"Model reload promoted {self.probation_config}: median inference {median_ms:.1f}ms (before: {baseline_str})")
+
+    def record_error(self, error):
+        """Called when the detector raised during inference. Returns True if it was handled by a rollback."""
+        if not self.on_probation:
+            return False
+        self._request_rollback(f"detect() raised {type(error).__name__}: {error}")
+        return True
+
+    def _request_rollback(self, reason):
+        self.rollback_reason = reason
+        self.rollback_requested = True
+
+    def status(self):
+        return {
+            "state": self.state,
+            "message": self.message,
+            "requested": self.config,
+            "active": self.active_config,
+            "on_probation": self.probation_config if self.on_probation else None,
+            "load_s": self.load_s,
+            "warmup_ms": self.warmup_ms,
+            "baseline_inference_ms": self.baseline_ms,
+            "probation_frames": len(self.probation_ms),
+            "probation_median_ms": statistics.median(self.probation_ms) if self.probation_ms else None,
+            "max_regression": self.max_regression,
+        }
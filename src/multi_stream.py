@@ -0,0 +1,224 @@
+# src/multi_stream.py
+# One server, several camera streams, one shared pool of detectors.
+#
+# Streams are listed in a JSON file (path in TRACKER_STREAMS, default: a single CSI camera):
+#
+#   [
+#     {"name": "front", "source": "csi:0", "priority": 2},
+#     {"name": "door", "source": "usb:0", "max_fps": 5},
+#     {"name": "test", "source": "replay:captured_media/test_video.mp4", "max_fps": 2}
+#   ]
+#
+# Each stream is served on /ws/{name} and started/stopped with POST /streams/{name}/start|stop.
+# All streams share TRACKER_DETECTORS detector instances (default 2) of backend TRACKER_BACKEND
+# ("ssd" or "yolo"), scheduled fairly by InferenceScheduler. With the yolo backend,
+# TRACKER_BATCH > 1 (default 1) lets one inference take frames from up to that many streams;
+# the model has to be exported with a dynamic or large enough batch dimension.
+#
+# Run from the src/ directory:
+#   TRACKER_STREAMS=streams.json uvicorn multi_stream:app --host 0.0.0.0 --port 8000
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, WebSocket, HTTPException
+
+from detectors import create_detector
+from frame_sources import open_source
+from frame_timing import LatencyBudget
+from inference_scheduler import InferenceScheduler
+from pipeline_stages import draw_detections, encode_jpeg
+
+DEFAULT_STREAMS = [{"name": "csi", "source": "csi:0"}]
+
+
+class ManagedStream:
+    def __init__(self, name, source_spec, scheduler, priority=1, max_fps=None):
+        self.name = name
+        self.source_spec = source_spec
+        self.scheduler = scheduler
+        self.priority = priority
+        self.max_fps = max_fps
+        self.active = False
+        self.connections = set()
+        self.task = None
+        # ⏱️ Frames older than TRACKER_MAX_FRAME_AGE_MS are dropped, e.g. after a long scheduler wait
+        self.latency_budget = LatencyBudget()
+
+        # ⏱️ For performance monitoring
+        self.frames_sent = 0
+        self.fps = 0.0
+        self.frame_count_for_fps = 0
+        self.fps_start_time = time.monotonic()
+
+    async def run(self):
+        source = open_source(self.source_spec)
+        await asyncio.to_thread(source.start)
+        self.scheduler.register(self.name, self.priority, self.max_fps)
+        try:
+            while self.active:
+                frame, capture_time = await asyncio.to_thread(source.read)
+                if frame is None:
+                    print(f"[{self.name}] Source ended.")
+                    break
+                if self.latency_budget.expired("inference", capture_time):
+                    continue
+
+                detections = await self.scheduler.submit(self.name, frame)
+                if detections is None:
+                    continue
+                if self.latency_budget.expired("annotate", capture_time):
+                    continue
+
+                annotated_frame = frame.copy()
+                draw_detections(annotated_frame, detections)
+                annotated_frame_jpeg = encode_jpeg(annotated_frame)
+                if annotated_frame_jpeg is None:
+                    continue
+                if self.latency_budget.expired("send", capture_time):
+                    continue
+
+                self.frames_sent += 1
+                self.frame_count_for_fps += 1
+                now = time.monotonic()
+                if now - self.fps_start_time >= 1.0:
+                    self.fps = self.frame_count_for_fps / (now - self.fps_start_time)
+                    self.frame_count_for_fps = 0
+                    self.fps_start_time = now
+
+                payload = annotated_frame_jpeg.tobytes()
+                tasks = [websocket.send_bytes(payload) for websocket in self.connections.copy()]
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self.latency_budget.record_sent(capture_time)
+        finally:
+            self.scheduler.unregister(self.name)
+            await asyncio.to_thread(source.close)
+            self.active = False
+
+    async def start(self):
+        if not self.active:
+            self.active = True
+            self.task = asyncio.create_task(self.run())
+            print(f"[{self.name}] Stream started from {self.source_spec}.")
+
+    async def stop(self):
+        if self.active:
+            self.active = False
+            if self.task:
+                try:
+                    await self.task
+                except Exception as e:
+                    print(f"[{self.name}] Error awaiting stream task during stop: {e}")
+                self.task = None
+            print(f"[{self.name}] Stream stopped.")
+
+    def stats(self):
+        return {
+            "source": self.source_spec,
+            "active": self.active,
+            "clients": len(self.connections),
+            "fps": self.fps,
+            "frames_sent": self.frames_sent,
+            "latency": self.latency_budget.stats(),
+        }
+
+
+def load_stream_config():
+    path = os.environ.get("TRACKER_STREAMS")
+    if not path:
+        return DEFAULT_STREAMS
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def build_detectors():
+    backend = os.environ.get("TRACKER_BACKEND", "ssd")
+    count = int(os.environ.get("TRACKER_DETECTORS", "2"))
+    # Split the cores between the detectors so they don't fight over them
+    threads = max(1, (os.cpu_count() or 1) // count)
+    batch = int(os.environ.get("TRACKER_BATCH", "1"))
+    if backend == "ssd":
+        if batch > 1:
+            print("TRACKER_BATCH is ignored for the ssd backend: its TFLite model takes one frame per call")
+        kwargs = {"num_threads": threads}
+    else:
+        kwargs = {"max_batch": max(1, batch)}
+    return [create_detector(backend, **kwargs) for _ in range(count)]
+
+
+scheduler = None
+streams = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global scheduler
+    print("Application startup: Loading detectors.")
+    scheduler = InferenceScheduler(await asyncio.to_thread(build_detectors))
+    scheduler.start()
+    for config in load_stream_config():
+        streams[config["name"]] = ManagedStream(
+            config["name"], config["source"], scheduler,
+            priority=config.get("priority", 1), max_fps=config.get("max_fps"),
+        )
+    print(f"Configured streams: {', '.join(streams)}")
+    yield
+    print("Application shutdown: Stopping streams gracefully.")
+    for stream in streams.values():
+        await stream.stop()
+    await asyncio.to_thread(scheduler.stop)
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def get_stream(name):
+    stream = streams.get(name)
+    if stream is None:
+        raise HTTPException(status_code=404, detail=f"Unknown stream: {name}")
+    return stream
+
+
+@app.websocket("/ws/{name}")
+async def websocket_endpoint(websocket: WebSocket, name: str):
+    stream = streams.get(name)
+    if stream is None:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    stream.connections.add(websocket)
+    print(f"[{name}] WebSocket connected. Total clients: {len(stream.connections)}")
+
+    try:
+        while True:
+            await websocket.receive_text()
+    except Exception as e:
+        print(f"[{name}] WebSocket disconnected due to: {e}")
+    finally:
+        stream.connections.discard(websocket)
+        print(f"[{name}] WebSocket disconnected. Remaining clients: {len(stream.connections)}")
+        if not stream.connections and stream.active:
+            await stream.stop()
+
+
+@app.get("/streams")
+async def list_streams():
+    """Per-stream state plus the scheduler's fairness and batching statistics."""
+    return {
+        "streams": {name: stream.stats() for name, stream in streams.items()},
+        "scheduler": scheduler.stats(),
+    }
+
+
+@app.post("/streams/{name}/start")
+async def start_stream(name: str):
+    await get_stream(name).start()
+    return {"message": f"Stream {name} started"}
+
+
+@app.post("/streams/{name}/stop")
+async def stop_stream(name: str):
+    await get_stream(name).stop()
+    return {"message": f"Stream {name} stopped"}
@@ -0,0 +1,131 @@
+# src/pipeline_stages.py
+# The individual stages of the detection pipeline (decode -> preprocess -> invoke ->
+# post-process -> overlay -> encode) as plain functions. Nothing in here touches the
+# camera, so the same code runs in ssd.py on the Pi and in benchmark.py on any Linux box.
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# One detected object, in pixel coordinates of the frame it was found in.
+Detection = namedtuple("Detection", ["label", "class_id", "score", "x", "y", "w", "h"])
+
+BOX_COLOR = (0, 255, 0)
+TEXT_COLOR = (0, 0, 0)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.6
+FONT_THICKNESS = 2
+
+
+def decode_jpeg(jpeg_data):
+    """Decodes a JPEG buffer into a BGR image. Returns None if the data is corrupt."""
+    np_arr = np.frombuffer(jpeg_data, np.uint8)
+    return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+
+
+def preprocess_frame(img, input_width, input_height, input_dtype, pool=None):
+    """Converts a BGR frame into the (1, H, W, 3) RGB tensor the TFLite model expects.
+
+    With a FrameBufferPool the intermediate and returned arrays come from the pool; release
+    the returned tensor once it has been copied into the interpreter.
+    """
+    # Resize before the colour conversion, so the conversion touches 300x300 pixels instead of
+    # 1920x1080 (both are per-channel operations, so the result is identical)
+    if pool is None:
+        img_resized = cv2.resize(img, (input_width, input_height))
+        img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
+        input_data = np.expand_dims(img_rgb, axis=0)
+
+        # Normalize pixel values for FLOAT32 model input
+        if input_dtype == np.float32:
+            input_data = (np.float32(input_data) - 127.5) / 127.5
+        return input_data
+
+    img_resized = pool.acquire((input_height, input_width, 3))
+    cv2.resize(img, (input_width, input_height), dst=img_resized)
+    input_data = pool.acquire((1, input_height, input_width, 3))
+    cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB, dst=input_data[0])
+    pool.release(img_resized)
+
+    if input_dtype == np.float32:
+        float_data = pool.acquire(input_data.shape, np.float32)
+        np.subtract(input_data, 127.5, out=float_data, dtype=np.float32)
+        float_data /= 127.5
+        pool.release(input_data)
+        input_data = float_data
+    return input_data
+
+
+def read_ssd_outputs(interpreter, output_details):
+    """Reads the four SSD post-processing output tensors (boxes, classes, scores, count)."""
+    boxes = interpreter.get_tensor(output_details[0]['index'])[0]
+    classes = interpreter.get_tensor(output_details[1]['index'])[0]
+    scores = interpreter.get_tensor(output_details[2]['index'])[0]
+    num_detections = int(interpreter.get_tensor(output_details[3]['index'])[0])
+    return boxes, classes, scores, num_detections
+
+
+def ssd_postprocess(boxes, classes, scores, num_detections, labels, im_w, im_h, score_threshold=0.5):
+    """Turns raw SSD outputs (normalized ymin, xmin, ymax, xmax boxes) into Detections."""
+    detections = []
+    for i in range(num_detections):
+        if scores[i] > score_threshold:
+            ymin, xmin, ymax, xmax = boxes[i]
+            x = int(xmin * im_w)
+            y = int(ymin * im_h)
+            w = int(xmax * im_w) - x
+            h = int(ymax * im_h) - y
+
+            class_id = int(classes[i])
+            label = labels[class_id] if class_id < len(labels) else "Unknown"
+            detections.append(Detection(label, class_id, float(scores[i]), x, y, w, h))
+    return detections
+
+
+def draw_detections(frame, detections):
+    """Draws boxes and "label: score" tags onto the frame in place."""
+    for det in detections:
+        x, y, w, h = det.x, det.y, det.w, det.h
+        cv2.rectangle(frame, (x, y), (x + w, y + h), BOX_COLOR, 2)
+
+        label_text = f"{det.label}: {det.score:.2f}"
+        (text_width, text_height), baseline = cv2.getTextSize(label_text, FONT, FONT_SCALE, FONT_THICKNESS)
+        cv2.rectangle(frame, (x, y - text_height - baseline), (x + text_width, y), BOX_COLOR, -1)
+        cv2.putText(frame, label_text, (x, y - baseline), FONT, FONT_SCALE, TEXT_COLOR, FONT_THICKNESS)
+    return frame
+
+
+def encode_jpeg(frame):
+    """Encodes a BGR frame as JPEG. Returns the encoded buffer, or None on failure."""
+    ok, jpeg = cv2.imencode('.jpg', frame)
+    return jpeg if ok else None
+
+
+def stamp_jpeg(jpeg_bytes, capture_time):
+    """Embeds the capture wall-clock time in a JPEG comment (COM) segment right after SOI.
+
+    Viewers ignore COM segments, so the frame still displays normally, but tools like
+    load_test.py can read the timestamp back with read_jpeg_stamp() to measure frame age.
+    """
+    payload = f"capture_time={capture_time:.6f}".encode()
+    segment = b"\xff\xfe" + (len(payload) + 2).to_bytes(2, "big") + payload
+    return jpeg_bytes[:2] + segment + jpeg_bytes[2:]
+
+
+def read_jpeg_stamp(jpeg_bytes):
+    """Returns the capture time written by stamp_jpeg(), or None if the frame isn't stamped."""
+    if jpeg_bytes[2:4] != b"\xff\xfe":
+        return None
+    length = int.from_bytes(jpeg_bytes[4:6], "big")
+    key, _, value = jpeg_bytes[6:4 + length].decode(errors="replace").partition("=")
+    return float(value) if key == "capture_time" else None
+
+
+def summarize_detections(detections):
+    """Builds the "2 person, 1 dog" string printed after every frame."""
+    detected_counts = {}
+    for det in detections:
+        detected_counts[det.label] = detected_counts.get(det.label, 0) + 1
+
+    objects_str = ", ".join([f"{count} {name}" for name, count in detected_counts.items()])
+    return objects_str or "No objects detected"
@@ -0,0 +1,114 @@
+# src/sampling_profiler.py
+# On-demand statistical profiler for the streaming servers.
+#
+# While a profile runs, a sampler thread wakes up every few milliseconds, grabs the current
+# Python stack of every other thread (sys._current_frames()) and counts it. Nothing is hooked
+# into the interpreter and the pipeline code isn't touched, so when no profile is running
+# there's no overhead at all; while one runs the cost is one stack walk per thread per tick.
+#
+# Native code (the TFLite interpreter, OpenCV, NCNN) doesn't have Python frames of its own, so
+# time spent in it is attributed to the Python function that called it, e.g. cv2.imdecode shows
+# up as pipeline_stages.py:decode_jpeg and interpreter.invoke() as interpreter.py:invoke.
+#
+# The result has:
+#   * "collapsed": one "thread;outer;...;inner count" line per distinct stack, the format
+#     flamegraph.pl and speedscope read
+#   * "functions": the fraction of sampling ticks in which each function was on a thread's
+#     stack (inclusive) or at the top of it (self); a function running in several threads at
+#     once can exceed 1.0
+#   * "focus": the same, limited to the functions of the given files (e.g. ssd.py)
+#   * "threads": the fraction of ticks each thread was alive and sampled
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_INTERVAL_S = 0.005
+# Below 1ms the sampler would spin on sys._current_frames() under the GIL and slow down the
+# very threads it's watching
+MIN_INTERVAL_S = 0.001
+MAX_INTERVAL_S = 1.0
+MAX_DURATION_S = 120.0
+
+
+def frame_label(frame):
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name) # co_qualname is Python 3.11+
+    return f"{os.path.basename(code.co_filename)}:{name}"
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.lock.locked()
+
+    def profile(self, duration_s, interval_s=DEFAULT_INTERVAL_S, focus_files=(), top=30):
+        """Samples all threads for duration_s seconds and returns the report. Blocks; run it in a thread."""
+        if not 0 < duration_s <= MAX_DURATION_S:
+            raise ValueError(f"duration must be more than 0 and at most {MAX_DURATION_S:.0f}s")
+        if not MIN_INTERVAL_S <= interval_s <= MAX_INTERVAL_S:
+            raise ValueError(f"interval must be between {MIN_INTERVAL_S * 1000:.0f}ms and {MAX_INTERVAL_S * 1000:.0f}ms")
+        if not self.lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            stacks, ticks, elapsed = self._sample(duration_s, interval_s)
+        finally:
+            self.lock.release()
+        return self._report(stacks, ticks, elapsed, interval_s, focus_files, top)
+
+    def _sample(self, duration_s, interval_s):
+        own_id = threading.get_ident()
+        stacks = Counter()
+        ticks = 0
+        start = time.monotonic()
+        deadline = start + duration_s
+        next_tick = start
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, f"thread-{thread_id}"))
+                stacks[tuple(reversed(labels))] += 1
+            ticks += 1
+            next_tick += interval_s
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+        return stacks, ticks, time.monotonic() - start
+
+    def _report(self, stacks, ticks, elapsed, interval_s, focus_files, top):
+        inclusive = Counter()
+        exclusive = Counter()
+        per_thread = Counter()
+        for stack, count in stacks.items():
+            per_thread[stack[0]] += count
+            exclusive[stack[-1]] += count
+            for label in set(stack[1:]): # Recursion shouldn't count a sample twice
+                inclusive[label] += count
+
+        def shares(labels):
+            return [
+                {"function": label, "inclusive": inclusive[label] / ticks, "self": exclusive[label] / ticks}
+                for label in labels
+            ]
+
+        focus = [label for label in inclusive if label.split(":", 1)[0] in focus_files]
+        return {
+            "duration_s": elapsed,
+            "interval_ms": interval_s * 1000,
+            "ticks": ticks,
+            "threads": {name: count / ticks for name, count in per_thread.most_common()} if ticks else {},
+            "functions": shares([label for label, _ in inclusive.most_common(top)]) if ticks else [],
+            "focus": sorted(shares(focus), key=lambda entry: -entry["inclusive"]) if ticks else [],
+            "collapsed": "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()),
+        }
@@ -1,35 +1,21 @@
-import io
 import asyncio
 import os
 import time
-import csv # Added for CSV writing
-import matplotlib.pyplot as plt # Added for plotting
-from picamera2 import Picamera2
-from picamera2.encoders import MJPEGEncoder, Quality
-from picamera2.outputs import FileOutput
-from fastapi import FastAPI, WebSocket
-from threading import Condition
+from fastapi import FastAPI, WebSocket, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from tflite_runtime.interpreter import Interpreter
-import numpy as np
-import cv2
-
-
-class StreamingOutput(io.BufferedIOBase):
-    def __init__(self):
-        super().__init__()
-        self.frame = None
-        self.condition = Condition()
-
-    def write(self, buf):
-        with self.condition:
-            self.frame = buf
-            self.condition.notify_all()
-
-    async def read(self):
-        with self.condition:
-            self.condition.wait()
-            return self.frame
+from governor import InferenceGovernor
+from target_lock import TargetLock, offset_detections, draw_lock_region
+from detectors import SsdDetector
+from cascade import ModelCascade
+from model_reload import ModelReloader
+from sampling_profiler import SamplingProfiler, MAX_DURATION_S, MIN_INTERVAL_S, MAX_INTERVAL_S
+from zone_analytics import ZoneAnalytics
+from frame_sources import open_source
+from buffer_pool import FrameBufferPool, MemoryReport
+from metrics_store import MetricsRecorder
+from frame_timing import LatencyBudget, monotonic_to_wall
+from pipeline_stages import draw_detections, encode_jpeg, stamp_jpeg, summarize_detections
 
 
 class JpegStream:
@@ -37,148 +23,171 @@ class JpegStream:
         super().__init__() # Call parent constructor if JpegStream inherits from anything
         self.active = False
         self.connections = set()
-        self.picam2 = None
         self.task = None
 
+        # Frame source (see frame_sources.py): the CSI camera by default, or e.g. TRACKER_SOURCE=synthetic or replay:clip.mp4
+        self.source_spec = os.environ.get("TRACKER_SOURCE", "csi")
+        self.source = None
+        # Embed capture timestamps in the sent JPEGs (used by load_test.py to measure frame age)
+        self.stamp_frames = os.environ.get("TRACKER_STAMP_FRAMES") == "1"
+
         # --- TFLite Model Setup ---
         self.model_path = os.path.join(os.path.dirname(__file__), "..", "models", "ssd_mobilenet_v2.tflite")
         self.labels_path = os.path.join(os.path.dirname(__file__), "..", "models", "coco_labels.txt") # Make sure this file exists with your class labels
-        
-        self.interpreter = None
-        self.input_details = None
-        self.output_details = None
-        self.labels = []
-        self.input_height = None
-        self.input_width = None
-
-        # ⏱️ For performance monitoring
-        self.inference_latencies_ms = [] # To store inference_ms for each frame
-        self.total_latencies_ms = []    # To store total_ms for each frame
-        self.fps_values = []            # To store calculated FPS per second
+        # Optional heavier model (e.g. a TFLite export of the 640x640 FPN-Lite SSD) for cascade mode
+        self.cascade_model_path = os.environ.get("TRACKER_CASCADE_MODEL")
+
+        self.score_threshold = 0.5
+        self.detector = None # SsdDetector, or ModelCascade when a cascade model is configured
+        # 🔄 Swaps in a new model (POST /model/reload) between frames, without stopping the stream
+        self.model_reloader = ModelReloader()
+
+        # ♻️ Reused full-size buffers, so the loop doesn't allocate new 6 MB frames every iteration
+        self.pool = FrameBufferPool()
+        self.memory_report = MemoryReport(self.pool, trace_allocations=os.environ.get("TRACKER_TRACE_ALLOCATIONS") == "1")
+
+        # ⏱️ Frames older than TRACKER_MAX_FRAME_AGE_MS are dropped at whichever stage notices it
+        self.latency_budget = LatencyBudget()
+
+        # ⏱️ For performance monitoring; samples go to disk as they're recorded (see metrics_store.py)
+        self.metrics = None
         self.frame_count_for_fps = 0    # Counter for FPS calculation
         self.fps_start_time = time.monotonic() # Timer for FPS calculation
 
-    async def _load_model(self):
-        """Loads the TFLite model and labels."""
-        try:
-            self.interpreter = Interpreter(model_path=self.model_path)
-            self.interpreter.allocate_tensors()
+        # 🌡️ Backs off inference as the SoC nears its thermal limit
+        self.governor = InferenceGovernor()
+        self.last_detections = []
 
-            self.input_details = self.interpreter.get_input_details()
-            self.output_details = self.interpreter.get_output_details()
-            
-            self.input_height, self.input_width = self.input_details[0]['shape'][1:3]
+        # 🎯 Optional lock-on mode for following one class, e.g. TRACKER_LOCK_CLASS=person
+        lock_class = os.environ.get("TRACKER_LOCK_CLASS")
+        self.target_lock = TargetLock(lock_class) if lock_class else None
+        self.last_crop = None
 
-            with open(self.labels_path, 'r') as f:
-                self.labels = [line.strip() for line in f.readlines()]
-            
-            print(f"Loaded TFLite model from {self.model_path}")
-            print(f"Model input shape: {self.input_details[0]['shape']}, dtype: {self.input_details[0]['dtype']}")
+        # 📊 Live object counts, zone occupancy/dwell and line crossings (zones/lines from TRACKER_ZONES)
+        self.analytics = ZoneAnalytics.from_config(os.environ.get("TRACKER_ZONES"))
+
+    def _build_detector(self, model_path, cascade_model_path, score_threshold):
+        """Builds the SSD detector, wrapped in a ModelCascade when a cascade model is given."""
+        detector = SsdDetector(model_path, self.labels_path, score_threshold=score_threshold, pool=self.pool)
+        print(f"Loaded TFLite model from {model_path}")
+        print(f"Model input shape: {detector.input_shape}, dtype: {detector.input_dtype}")
+
+        if cascade_model_path:
+            expensive = SsdDetector(cascade_model_path, self.labels_path, score_threshold=score_threshold, pool=self.pool)
+            band_low, band_high = (float(v) for v in os.environ.get("TRACKER_CASCADE_BAND", "0.3,0.6").split(","))
+            audit_every = int(os.environ.get("TRACKER_CASCADE_AUDIT_EVERY", "30"))
+            detector = ModelCascade(detector, expensive, band_low, band_high, score_threshold, audit_every=audit_every)
+            print(f"Cascade enabled: escalating ambiguous frames to {cascade_model_path} (input shape {expensive.input_shape})")
+        return detector
+
+    async def _load_model(self):
+        """Loads the TFLite model(s) and labels."""
+        try:
+            self.detector = self._build_detector(self.model_path, self.cascade_model_path, self.score_threshold)
         except Exception as e:
             print(f"Error loading TFLite model or labels: {e}")
             self.active = False # Ensure stream doesn't start if model loading fails
             raise # Re-raise to stop the application startup
 
+    def _release_frame(self, img):
+        """Hands a source frame's buffer back to the pool (every source writes into pooled buffers)."""
+        self.pool.release(img)
+
     async def stream_jpeg(self):
         # Load model before starting camera
-        if self.interpreter is None:
+        if self.detector is None:
             await self._load_model()
             if not self.active: # If loading failed and active was set to False
                 return
 
-        self.picam2 = Picamera2()
-        video_config = self.picam2.create_video_configuration(
-            main={"size": (1920, 1080), "format": "RGB888"} # Using RGB888 for easier OpenCV integration
-        )
-        self.picam2.configure(video_config)
-        output = StreamingOutput()
-        self.picam2.start_recording(MJPEGEncoder(), FileOutput(output), Quality.MEDIUM)
-
-        # Reset metrics when stream starts
-        self.inference_latencies_ms = []
-        self.total_latencies_ms = []
-        self.fps_values = []
+        # Camera frames are copied straight from the ISP into pooled buffers (frame_sources.PicameraSource)
+        self.source = open_source(self.source_spec, pool=self.pool)
+        await asyncio.to_thread(self.source.start)
+
+        # Every stream start is a new metrics run
+        self.metrics = MetricsRecorder("ssd")
         self.frame_count_for_fps = 0
         self.fps_start_time = time.monotonic()
+        self.last_detections = []
+        self.last_crop = None
+        self.latency_budget = LatencyBudget()
 
 
         try:
             while self.active:
                 start_total_time = time.monotonic() # Start overall frame processing timer
+                self.memory_report.begin_frame()
 
-                jpeg_data = await output.read()
-
-                np_arr = np.frombuffer(jpeg_data, np.uint8)
-                img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
+                img, capture_time = await asyncio.to_thread(self.source.read)
                 if img is None:
-                    continue # Skip if frame decode fails
-
-                # --- Preprocessing for TFLite Model ---
-                start_preprocess_time = time.monotonic()
-                img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                img_resized = cv2.resize(img_rgb, (self.input_width, self.input_height))
-                input_data = np.expand_dims(img_resized, axis=0)
-                
-                # Normalize pixel values for FLOAT32 model input
-                if self.input_details[0]['dtype'] == np.float32:
-                    input_data = (np.float32(input_data) - 127.5) / 127.5 
-                
-                end_preprocess_time = time.monotonic()
-                preprocess_ms = (end_preprocess_time - start_preprocess_time) * 1000
-
-                self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
-
-                start_inference_time = time.monotonic()
-                self.interpreter.invoke()
-                end_inference_time = time.monotonic()
-                inference_ms = (end_inference_time - start_inference_time) * 1000
-
-                # --- Get detection results and Post-processing ---
-                start_postprocess_time = time.monotonic()
-                boxes = self.interpreter.get_tensor(self.output_details[0]['index'])[0]       
-                classes = self.interpreter.get_tensor(self.output_details[1]['index'])[0]    
-                scores = self.interpreter.get_tensor(self.output_details[2]['index'])[0]     
-                num_detections = int(self.interpreter.get_tensor(self.output_details[3]['index'])[0]) 
-
-
-                annotated_frame = img.copy() 
-                im_h, im_w, _ = annotated_frame.shape
-                
-                detected_objects_summary = [] 
-
-                for i in range(num_detections):
-                    if scores[i] > 0.5: 
-                        ymin, xmin, ymax, xmax = boxes[i]
-                        x = int(xmin * im_w)
-                        y = int(ymin * im_h)
-                        w = int(xmax * im_w) - x
-                        h = int(ymax * im_h) - y
-
-                        class_id = int(classes[i])
-                        label = self.labels[class_id] if class_id < len(self.labels) else "Unknown"
-                        score = scores[i]
-
-                        detected_objects_summary.append(label)
-
-                        cv2.rectangle(annotated_frame, (x, y), (x + w, y + h), (0, 255, 0), 2) 
-                        
-                        label_text = f"{label}: {score:.2f}"
-                        (text_width, text_height), baseline = cv2.getTextSize(label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                        cv2.rectangle(annotated_frame, (x, y - text_height - baseline), (x + text_width, y), (0, 255, 0), -1)
-                        cv2.putText(annotated_frame, label_text, (x, y - baseline), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
-
-                end_postprocess_time = time.monotonic()
-                postprocess_ms = (end_postprocess_time - start_postprocess_time) * 1000
-
-                _, annotated_frame_jpeg = cv2.imencode('.jpg', annotated_frame)
+                    print("Frame source ended.")
+                    break
+                if self.latency_budget.expired("queue", capture_time):
+                    self._release_frame(img)
+                    continue
+
+                im_h, im_w, _ = img.shape
+                # 🔄 Frame boundary: a reloaded model (POST /model/reload) takes over here
+                self.detector = self.model_reloader.swap(self.detector)
+                self.model_reloader.offer_frame(img)
+                inferred = self.governor.should_infer()
+
+                if inferred and self.latency_budget.expired("inference", capture_time):
+                    self._release_frame(img)
+                    continue
+
+                if inferred:
+                    # 🎯 In lock-on mode, infer on a crop around the predicted target position
+                    self.last_crop = self.target_lock.plan(im_w, im_h) if self.target_lock else None
+                    crop = self.last_crop
+                    roi = img if crop is None else img[crop[1]:crop[3], crop[0]:crop[2]]
+
+                    # --- Preprocessing, inference and post-processing ---
+                    start_inference_time = time.monotonic()
+                    try:
+                        detections = self.detector.detect(roi)
+                    except Exception as e:
+                        if not self.model_reloader.record_error(e):
+                            raise
+                        detections = [] # A freshly swapped-in model failed; it's rolled back next frame
+                    end_inference_time = time.monotonic()
+                    self.model_reloader.record_inference((end_inference_time - start_inference_time) * 1000)
+                    preprocess_ms = self.detector.preprocess_ms
+                    inference_ms = self.detector.inference_ms
+                    postprocess_ms = self.detector.postprocess_ms
+
+                    if crop is not None:
+                        detections = offset_detections(detections, crop[0], crop[1])
+                    if self.target_lock:
+                        self.target_lock.update(detections, crop)
+                    self.last_detections = detections
+                    if crop is None: # A lock-on crop only sees the target; everyone else would look gone
+                        self.analytics.update(detections, capture_time, (im_w, im_h))
+
+                    self.governor.record_inference(end_inference_time - start_inference_time)
+
+                if self.latency_budget.expired("annotate", capture_time):
+                    self._release_frame(img)
+                    continue
+
+                # Skipped frames (governor backing off) are still streamed, with the last known boxes
+                detections = self.last_detections
+                # Boxes are drawn straight onto the pooled source frame; nothing reads it after the encode
+                draw_detections(img, detections)
+                draw_lock_region(img, self.last_crop)
+                self.analytics.draw(img)
+                annotated_frame_jpeg = encode_jpeg(img)
+                self._release_frame(img)
+                if annotated_frame_jpeg is None:
+                    continue
 
                 end_total_time = time.monotonic()
                 total_ms = (end_total_time - start_total_time) * 1000
 
                 # --- Collect Metrics ---
-                self.inference_latencies_ms.append(inference_ms)
-                self.total_latencies_ms.append(total_ms)
+                if inferred:
+                    self.metrics.record("inference_ms", inference_ms)
+                self.metrics.record("total_ms", total_ms)
 
                 self.frame_count_for_fps += 1
                 current_time_for_fps = time.monotonic()
@@ -186,94 +195,61 @@ class JpegStream:
 
                 if elapsed_for_fps >= 1.0: # Calculate FPS every second
                     fps = self.frame_count_for_fps / elapsed_for_fps
-                    self.fps_values.append(fps)
+                    self.metrics.record("fps", fps)
                     self.frame_count_for_fps = 0
                     self.fps_start_time = current_time_for_fps
+                    print(f"Memory: {self.memory_report.summary()}")
+                    print(f"Latency: {self.latency_budget.summary()}")
 
 
                 # --- Print Latency Statistics ---
-                detected_counts = {}
-                for obj in detected_objects_summary:
-                    detected_counts[obj] = detected_counts.get(obj, 0) + 1
-                
-                objects_str = ", ".join([f"{count} {name}" for name, count in detected_counts.items()])
-                if not objects_str:
-                    objects_str = "No objects detected"
+                objects_str = summarize_detections(detections)
+
+                input_shape_for_print = self.detector.input_shape
 
-                input_shape_for_print = tuple(self.input_details[0]['shape'])
+                if self.last_crop is not None:
+                    x0, y0, x1, y1 = self.last_crop
+                    print(f"0: {im_w}x{im_h} locked on {self.target_lock.target_label}, crop {x1 - x0}x{y1 - y0} at ({x0}, {y0}) {objects_str}, {total_ms:.1f}ms")
+                else:
+                    print(f"0: {im_w}x{im_h} {objects_str}, {total_ms:.1f}ms")
+                if inferred:
+                    print(f"Speed: {preprocess_ms:.1f}ms preprocess, {inference_ms:.1f}ms inference, {postprocess_ms:.1f}ms postprocess per image at shape {input_shape_for_print}")
+                    if getattr(self.detector, "escalated", False):
+                        print("Cascade: ambiguous scores, escalated to the expensive model")
+                else:
+                    print(f"Inference skipped by governor (duty cycle {self.governor.duty:.2f}, {self.governor.temperature_c}°C)")
 
-                print(f"0: {im_w}x{im_h} {objects_str}, {total_ms:.1f}ms")
-                print(f"Speed: {preprocess_ms:.1f}ms preprocess, {inference_ms:.1f}ms inference, {postprocess_ms:.1f}ms postprocess per image at shape {input_shape_for_print}")
 
+                if self.latency_budget.expired("send", capture_time):
+                    continue
 
+                payload = annotated_frame_jpeg.tobytes()
+                if self.stamp_frames:
+                    payload = stamp_jpeg(payload, monotonic_to_wall(capture_time))
                 tasks = [
-                    websocket.send_bytes(annotated_frame_jpeg.tobytes())
+                    websocket.send_bytes(payload)
                     for websocket in self.connections.copy()
                 ]
                 await asyncio.gather(*tasks, return_exceptions=True)
+                self.metrics.record("glass_to_send_ms", self.latency_budget.record_sent(capture_time))
+
+                self.memory_report.end_frame()
         finally:
-            if self.picam2:
-                self.picam2.stop_recording()
-                self.picam2.close()
-                self.picam2 = None
-            
-            # Save metrics and plot when the stream stops
-            self.save_metrics()
-
-    def save_metrics(self):
-        metrics_dir = os.path.join(os.path.dirname(__file__), "..", "metrics", "ssd")
-        os.makedirs(metrics_dir, exist_ok=True) # Ensure directory exists
-
-        # 💾 Save inference latency to CSV
-        inference_csv_path = os.path.join(metrics_dir, "inference_metrics.csv")
-        with open(inference_csv_path, "w", newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["Frame", "Inference Latency (ms)"])
-            for i, latency in enumerate(self.inference_latencies_ms):
-                writer.writerow([i, latency])
-        print(f"Saved inference metrics to: {inference_csv_path}")
-
-        # 💾 Save FPS values to CSV
-        fps_csv_path = os.path.join(metrics_dir, "fps_metrics.csv")
-        with open(fps_csv_path, "w", newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["Second", "FPS"])
-            for i, fps in enumerate(self.fps_values):
-                writer.writerow([i, fps])
-        print(f"Saved FPS metrics to: {fps_csv_path}")
-
-        # 📈 Plot and save performance metrics
-        performance_plot_path = os.path.join(metrics_dir, "performance_metrics.png")
-        plt.figure(figsize=(12, 5))
-        
-        plt.subplot(1, 2, 1)
-        plt.plot(self.inference_latencies_ms, label="Inference Latency (ms)", color='blue')
-        plt.xlabel("Frame Number")
-        plt.ylabel("Latency (ms)")
-        plt.title("Inference Latency per Frame (SSD MobileNet V2)")
-        plt.grid(True)
-        plt.legend()
-
-        plt.subplot(1, 2, 2)
-        plt.plot(self.fps_values, label="FPS", color="orange")
-        plt.xlabel("Time (seconds)")
-        plt.ylabel("Frames per Second")
-        plt.title("FPS Over Time (SSD MobileNet V2)")
-        plt.grid(True)
-        plt.legend()
-
-        plt.tight_layout()
-        plt.savefig(performance_plot_path)
-        plt.close() # Close the plot to free memory
-        print(f"Saved performance plot to: {performance_plot_path}")
+            if self.source:
+                await asyncio.to_thread(self.source.close)
+                self.source = None
 
+            # Samples are already on disk; this only flushes the last second
+            self.metrics.close()
+            print(f"Metrics saved to: {self.metrics.directory} (plot with: python src/metrics_report.py ssd)")
 
     async def start(self):
         """Starts the JPEG stream and model loading."""
         if not self.active:
             self.active = True
             try:
-                await self._load_model() 
+                if self.detector is None: # Keep the loaded (or hot-reloaded) model across restarts
+                    await self._load_model()
             except Exception:
                 print("Failed to load model, stream will not start.")
                 self.active = False
@@ -306,6 +282,8 @@ class JpegStream:
 
 
 jpeg_stream = JpegStream()
+profiler = SamplingProfiler() # 🔬 Only samples while POST /profile runs
+PROFILE_FOCUS_FILES = ("ssd.py", "pipeline_stages.py", "detectors.py", "cascade.py")
 
 
 @asynccontextmanager
@@ -348,4 +326,120 @@ async def start_stream():
 async def stop_stream():
     """Endpoint to explicitly stop the camera stream."""
     await jpeg_stream.stop()
-    return {"message": "Stream stopped via POST request"}
\ No newline at end of file
+    return {"message": "Stream stopped via POST request"}
+
+
+@app.get("/governor")
+async def governor_status():
+    """Current temperature, CPU load and inference duty cycle chosen by the governor."""
+    return jpeg_stream.governor.status()
+
+
+@app.get("/lock")
+async def lock_status():
+    """Lock-on mode state (set TRACKER_LOCK_CLASS to enable it)."""
+    if jpeg_stream.target_lock is None:
+        return {"enabled": False}
+    return {"enabled": True, **jpeg_stream.target_lock.status()}
+
+
+@app.get("/cascade")
+async def cascade_status():
+    """How often the cascade escalates to the expensive model and the average cost per frame."""
+    if not isinstance(jpeg_stream.detector, ModelCascade):
+        return {"enabled": False}
+    return {"enabled": True, **jpeg_stream.detector.stats()}
+
+
+@app.get("/memory")
+async def memory_status():
+    """Buffer pool usage, allocations per frame and peak RSS (TRACKER_TRACE_ALLOCATIONS=1 adds tracemalloc numbers)."""
+    return jpeg_stream.memory_report.stats()
+
+
+@app.get("/latency")
+async def latency_status():
+    """Glass-to-send latency histogram, frame age at each stage and stale frames dropped per stage."""
+    return jpeg_stream.latency_budget.stats()
+
+
+@app.post("/model/reload")
+async def reload_model(model_path: str = None, cascade_model_path: str = None, score_threshold: float = None, max_regression: float = None):
+    """Loads and warms up a new model in the background, then swaps it in between frames.
+
+    Omitted parameters keep their current values; an empty cascade_model_path turns the cascade
+    off. The new model is rolled back if its median inference time over the first frames
+    exceeds the old one by more than max_regression.
+    """
+    reloader = jpeg_stream.model_reloader
+    if reloader.busy:
+        raise HTTPException(status_code=409, detail=f"A reload is already in progress ({reloader.state})")
+    for path in (model_path, cascade_model_path):
+        if path and not os.path.exists(path):
+            raise HTTPException(status_code=404, detail=f"Model file not found: {path}")
+
+    current = reloader.active_config or {
+        "model_path": jpeg_stream.model_path,
+        "cascade_model_path": jpeg_stream.cascade_model_path,
+        "score_threshold": jpeg_stream.score_threshold,
+    }
+    config = {
+        "model_path": model_path or current["model_path"],
+        "cascade_model_path": (cascade_model_path or None) if cascade_model_path is not None else current["cascade_model_path"],
+        "score_threshold": score_threshold if score_threshold is not None else current["score_threshold"],
+    }
+    reloader.start_reload(lambda: jpeg_stream._build_detector(**config), config, max_regression)
+    return {"message": "Reload started", **reloader.status()}
+
+
+@app.get("/model")
+async def model_status():
+    """State of the last model reload (loading, warming, probation, promoted, rolled_back, failed)."""
+    return jpeg_stream.model_reloader.status()
+
+
+@app.post("/profile")
+async def profile(seconds: float = Query(10.0, gt=0, le=MAX_DURATION_S),
+                  interval_ms: float = Query(5.0, ge=MIN_INTERVAL_S * 1000, le=MAX_INTERVAL_S * 1000),
+                  format: str = "json"):
+    """Samples every thread's Python stack for `seconds` and reports where the time goes.
+
+    format=collapsed returns flamegraph.pl/speedscope input instead of JSON.
+    """
+    try:
+        report = await asyncio.to_thread(profiler.profile, seconds, interval_ms / 1000, PROFILE_FOCUS_FILES)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "collapsed":
+        return PlainTextResponse(report["collapsed"])
+    return report
+
+
+@app.get("/analytics")
+async def analytics_status():
+    """Live object counts and tracks, zone occupancy and dwell times, and line-crossing counts."""
+    return jpeg_stream.analytics.snapshot()
+
+
+@app.websocket("/ws/analytics")
+async def analytics_websocket(websocket: WebSocket, interval_ms: float = Query(500, ge=10)):
+    """Pushes the analytics snapshot whenever it changes, at most every interval_ms."""
+    await websocket.accept()
+
+    async def until_disconnected():
+        while True:
+            await websocket.receive_text() # Raises once the client is gone
+
+    # Without a pending receive, a client that left would only be noticed on the next send
+    disconnected = asyncio.create_task(until_disconnected())
+    last_version = None
+    try:
+        while not disconnected.done():
+            if jpeg_stream.analytics.version != last_version:
+                last_version = jpeg_stream.analytics.version
+                await websocket.send_json(jpeg_stream.analytics.snapshot())
+            await asyncio.wait([disconnected], timeout=interval_ms / 1000)
+    except Exception:
+        pass # Client went away
+    finally:
+        disconnected.cancel()
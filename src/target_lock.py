@@ -0,0 +1,139 @@
+# src/target_lock.py
+# Lock-on mode for following a single object class.
+#
+# The SSD model sees the whole 1920x1080 frame squeezed into 300x300, so a target that is
+# 60px wide in the frame is ~10px wide by the time the network sees it. Once the target class
+# has been found with high confidence, TargetLock instead asks for a square crop around where
+# the target is predicted to be (constant-velocity motion model), no smaller than the model's
+# input size. Small targets are then seen at close to native resolution, and nothing else in
+# the frame is processed. When the target is missed a few times in a row, or every
+# reacquire_interval_s as a safety net, the next inference is a full-frame search again.
+import time
+
+import cv2
+
+LOCK_COLOR = (0, 200, 255)
+
+
+def offset_detections(detections, x_offset, y_offset):
+    """Moves detections found in a crop back into full-frame pixel coordinates."""
+    return [det._replace(x=det.x + x_offset, y=det.y + y_offset) for det in detections]
+
+
+def draw_lock_region(frame, crop):
+    """Outlines the region the last inference ran on, so the lock is visible in the stream."""
+    if crop is not None:
+        cv2.rectangle(frame, (crop[0], crop[1]), (crop[2], crop[3]), LOCK_COLOR, 1)
+    return frame
+
+
+class TargetLock:
+    def __init__(self, target_label, input_size=(300, 300), lock_score=0.6, track_score=0.5,
+                 crop_scale=3.0, max_misses=3, reacquire_interval_s=5.0, smoothing=0.5, clock=time.monotonic):
+        self.target_label = target_label
+        self.input_size = input_size
+        self.lock_score = lock_score            # Score needed to acquire a lock from a full-frame search
+        self.track_score = track_score          # Score needed to keep the lock inside the crop
+        self.crop_scale = crop_scale            # Crop side as a multiple of the target's larger side
+        self.max_misses = max_misses
+        self.reacquire_interval_s = reacquire_interval_s
+        self.smoothing = smoothing
+        self.clock = clock
+
+        self.locked = False
+        self.box = None                         # (cx, cy, w, h) of the target in frame pixels
+        self.velocity = (0.0, 0.0)              # Pixels per second
+        self.last_seen = None
+        self.last_full_search = None
+        self.misses = 0
+
+        self.crop_inferences = 0
+        self.full_inferences = 0
+        self.locks_acquired = 0
+        self.locks_lost = 0
+
+    def plan(self, frame_w, frame_h):
+        """Returns the (x0, y0, x1, y1) crop to run inference on, or None for the full frame."""
+        now = self.clock()
+        if not self.locked:
+            return None
+        if self.last_full_search is None or now - self.last_full_search >= self.reacquire_interval_s:
+            return None
+
+        cx, cy, w, h = self.box
+        dt = now - self.last_seen
+        cx += self.velocity[0] * dt
+        cy += self.velocity[1] * dt
+
+        side = int(max(max(self.input_size), self.crop_scale * max(w, h)))
+        if side >= min(frame_w, frame_h):
+            return None  # Target is so big the crop wouldn't save anything
+
+        x0 = int(min(max(cx - side / 2, 0), frame_w - side))
+        y0 = int(min(max(cy - side / 2, 0), frame_h - side))
+        return (x0, y0, x0 + side, y0 + side)
+
+    def update(self, detections, crop):
+        """Feeds back the full-frame detections from the inference planned with plan(crop)."""
+        now = self.clock()
+        if crop is None:
+            self.full_inferences += 1
+            self.last_full_search = now
+        else:
+            self.crop_inferences += 1
+
+        threshold = self.track_score if self.locked else self.lock_score
+        candidates = [det for det in detections if det.label == self.target_label and det.score >= threshold]
+        if not candidates:
+            if self.locked:
+                self.misses += 1
+                if self.misses >= self.max_misses:
+                    self._unlock()
+            return
+
+        target = max(candidates, key=self._match_quality)
+        cx, cy = target.x + target.w / 2, target.y + target.h / 2
+        if self.locked and self.last_seen is not None:
+            dt = now - self.last_seen
+            if dt > 0:
+                vx = (cx - self.box[0]) / dt
+                vy = (cy - self.box[1]) / dt
+                self.velocity = (
+                    self.velocity[0] + self.smoothing * (vx - self.velocity[0]),
+                    self.velocity[1] + self.smoothing * (vy - self.velocity[1]),
+                )
+        else:
+            self.locked = True
+            self.locks_acquired += 1
+            self.velocity = (0.0, 0.0)
+
+        self.box = (cx, cy, target.w, target.h)
+        self.last_seen = now
+        self.misses = 0
+
+    def _match_quality(self, det):
+        """Highest score wins, but while locked prefer the candidate nearest the tracked target."""
+        if not self.locked:
+            return det.score
+        cx, cy, w, h = self.box
+        distance = abs(det.x + det.w / 2 - cx) + abs(det.y + det.h / 2 - cy)
+        return det.score - distance / (max(w, h) * 4 + 1)
+
+    def _unlock(self):
+        self.locked = False
+        self.box = None
+        self.velocity = (0.0, 0.0)
+        self.misses = 0
+        self.locks_lost += 1
+
+    def status(self):
+        total = self.crop_inferences + self.full_inferences
+        return {
+            "target_label": self.target_label,
+            "locked": self.locked,
+            "box": self.box,
+            "velocity_px_per_s": self.velocity,
+            "crop_inference_ratio": self.crop_inferences / total if total else 0.0,
+            "locks_acquired": self.locks_acquired,
+            "locks_lost": self.locks_lost,
+        }
@@ -1,71 +1,99 @@
-import io
 import os
 import time
 import asyncio
-import csv
-from picamera2 import Picamera2
-from picamera2.encoders import MJPEGEncoder, Quality
-from picamera2.outputs import FileOutput
-from fastapi import FastAPI, WebSocket
-from threading import Condition
+from fastapi import FastAPI, WebSocket, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from ultralytics import YOLO
-import numpy as np
-import cv2
-import matplotlib.pyplot as plt  # <-- Added for plotting
-
-class StreamingOutput(io.BufferedIOBase):
-    def __init__(self):
-        super().__init__()
-        self.frame = None
-        self.condition = Condition()
-
-    def write(self, buf):
-        with self.condition:
-            self.frame = buf
-            self.condition.notify_all()
-
-    async def read(self):
-        with self.condition:
-            self.condition.wait()
-            return self.frame
+from detectors import DEFAULT_YOLO_MODEL, YoloDetector
+from model_reload import ModelReloader
+from sampling_profiler import SamplingProfiler, MAX_DURATION_S, MIN_INTERVAL_S, MAX_INTERVAL_S
+from zone_analytics import ZoneAnalytics
+from buffer_pool import FrameBufferPool, MemoryReport
+from metrics_store import MetricsRecorder
+from frame_timing import LatencyBudget, monotonic_to_wall
+from governor import InferenceGovernor
+from frame_sources import open_source
+from pipeline_stages import draw_detections, encode_jpeg, stamp_jpeg, summarize_detections
 
 class JpegStream:
     def __init__(self):
         self.active = False
         self.connections = set()
-        self.picam2 = None
         self.task = None
-        self.model = YOLO("../models/yolov8n_ncnn_model")
+        self.source_spec = os.environ.get("TRACKER_SOURCE", "csi") # The CSI camera, or e.g. synthetic or replay:clip.mp4
+        self.source = None
+        self.stamp_frames = os.environ.get("TRACKER_STAMP_FRAMES") == "1"
+        self.detector = YoloDetector() # models/yolov8n_ncnn_model
+        # 🔄 Swaps in a new model (POST /model/reload) between frames, without stopping the stream
+        self.model_reloader = ModelReloader()
+        self.last_detections = []
+        # 📊 Live object counts, zone occupancy/dwell and line crossings (zones/lines from TRACKER_ZONES)
+        self.analytics = ZoneAnalytics.from_config(os.environ.get("TRACKER_ZONES"))
 
-        # ⏱️ For performance monitoring
-        self.latencies = []
-        self.fps_values = []
+        # ♻️ Reused full-size buffers for the source frames, which are annotated in place (results[0].plot() would copy them)
+        self.pool = FrameBufferPool()
+        self.memory_report = MemoryReport(self.pool, trace_allocations=os.environ.get("TRACKER_TRACE_ALLOCATIONS") == "1")
+
+        # ⏱️ Frames older than TRACKER_MAX_FRAME_AGE_MS are dropped at whichever stage notices it
+        self.latency_budget = LatencyBudget()
+
+        # 🌡️ Backs off inference as the SoC nears its thermal limit
+        self.governor = InferenceGovernor()
+
+        # ⏱️ For performance monitoring; samples go to disk as they're recorded (see metrics_store.py)
+        self.metrics = None
         self.last_time = time.perf_counter()
         self.frame_count = 0
         self.fps_start_time = time.perf_counter()
 
+    def _release_frame(self, img):
+        self.pool.release(img) # Every source writes into pooled buffers (see frame_sources.py)
+
     async def stream_jpeg(self):
-        self.picam2 = Picamera2()
-        video_config = self.picam2.create_video_configuration(
-            main={"size": (1920, 1080)}
-        )
-        self.picam2.configure(video_config)
-        output = StreamingOutput()
-        self.picam2.start_recording(MJPEGEncoder(), FileOutput(output), Quality.MEDIUM)
+        self.latency_budget = LatencyBudget()
+        # Camera frames are copied straight from the ISP into pooled buffers (frame_sources.PicameraSource)
+        self.source = open_source(self.source_spec, pool=self.pool)
+        await asyncio.to_thread(self.source.start)
 
+        self.metrics = MetricsRecorder("yolo") # Every stream start is a new metrics run
         try:
             while self.active:
-                jpeg_data = await output.read()
-                np_arr = np.frombuffer(jpeg_data, np.uint8)
-                img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+                self.memory_report.begin_frame()
+                img, capture_time = await asyncio.to_thread(self.source.read)
+                if img is None:
+                    break
+                if self.latency_budget.expired("queue", capture_time):
+                    self._release_frame(img)
+                    continue
 
-                start_time = time.perf_counter()  # ⏱️ Start inference timer
-                results = self.model(img)
-                end_time = time.perf_counter()  # ⏱️ End inference timer
+                # 🔄 Frame boundary: a reloaded model takes over here
+                self.detector = self.model_reloader.swap(self.detector)
+                self.model_reloader.offer_frame(img)
 
-                latency = (end_time - start_time) * 1000 # Convert to milliseconds
-                self.latencies.append(latency)
+                inferred = self.governor.should_infer()
+                if inferred and self.latency_budget.expired("inference", capture_time):
+                    self._release_frame(img)
+                    continue
+
+                if inferred:
+                    start_time = time.perf_counter()  # ⏱️ Start inference timer
+                    try:
+                        self.last_detections = self.detector.detect(img)
+                    except Exception as e:
+                        if not self.model_reloader.record_error(e):
+                            raise
+                        self.last_detections = [] # A freshly swapped-in model failed; it's rolled back next frame
+                    end_time = time.perf_counter()  # ⏱️ End inference timer
+                    self.governor.record_inference(end_time - start_time)
+
+                    latency = (end_time - start_time) * 1000 # Convert to milliseconds
+                    self.model_reloader.record_inference(latency)
+                    self.analytics.update(self.last_detections, capture_time, (img.shape[1], img.shape[0]))
+                    self.metrics.record("inference_ms", latency)
+
+                    im_h, im_w = img.shape[:2]
+                    print(f"0: {im_w}x{im_h} {summarize_detections(self.last_detections)}, {latency:.1f}ms")
+                    print(f"Speed: {self.detector.preprocess_ms:.1f}ms preprocess, {self.detector.inference_ms:.1f}ms inference, {self.detector.postprocess_ms:.1f}ms postprocess per image")
 
                 self.frame_count += 1
                 current_time = time.perf_counter()
@@ -73,72 +101,45 @@ class JpegStream:
 
                 if elapsed >= 1.0:
                     fps = self.frame_count / elapsed
-                    self.fps_values.append(fps)
+                    self.metrics.record("fps", fps)
                     self.frame_count = 0
                     self.fps_start_time = current_time
 
-                annotated_frame = results[0].plot()
-                _, annotated_frame_jpeg = cv2.imencode('.jpg', annotated_frame)
+                if self.latency_budget.expired("annotate", capture_time):
+                    self._release_frame(img)
+                    continue
+
+                # Frames skipped by the governor get the last boxes drawn onto the new image
+                # Drawn straight onto the pooled source frame, which goes back to the pool once encoded
+                draw_detections(img, self.last_detections)
+                self.analytics.draw(img)
+                annotated_frame_jpeg = encode_jpeg(img)
+                self._release_frame(img)
+                if annotated_frame_jpeg is None:
+                    continue
 
+                if self.latency_budget.expired("send", capture_time):
+                    continue
+
+                payload = annotated_frame_jpeg.tobytes()
+                if self.stamp_frames:
+                    payload = stamp_jpeg(payload, monotonic_to_wall(capture_time))
                 tasks = [
-                    websocket.send_bytes(annotated_frame_jpeg.tobytes())
+                    websocket.send_bytes(payload)
                     for websocket in self.connections.copy()
                 ]
                 await asyncio.gather(*tasks, return_exceptions=True)
+                self.metrics.record("glass_to_send_ms", self.latency_budget.record_sent(capture_time))
+
+                self.memory_report.end_frame()
         finally:
-            self.picam2.stop_recording()
-            self.picam2.close()
-            self.picam2 = None
-
-            # Save metrics and plot
-            self.save_metrics()
-
-    def save_metrics(self):
-        metrics_dir = os.path.join(os.path.dirname(__file__), "..", "metrics", "yolo")
-        os.makedirs(metrics_dir, exist_ok=True) # Ensure directory exists
-
-        # 💾 Save inference latency to CSV
-        inference_csv_path = os.path.join(metrics_dir, "inference_metrics.csv")
-        # 💾 Save to CSV
-        with open(inference_csv_path, "w", newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["Frame", "Latency (ms)"])
-            for i, latency in enumerate(self.latencies):
-                writer.writerow([i, latency])
-        print(f"Saved inference metrics to: {inference_csv_path}")
-
-        fps_csv_path = os.path.join(metrics_dir, "fps_metrics.csv")
-        with open(fps_csv_path, "w", newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["Second", "FPS"])
-            for i, fps in enumerate(self.fps_values):
-                writer.writerow([i, fps])
-        print(f"Saved FPS metrics to: {fps_csv_path}")
-
-        # 📈 Plot
-        performance_plot_path = os.path.join(metrics_dir, "performance_metrics.png")
-        plt.figure(figsize=(12, 5))
-        plt.subplot(1, 2, 1)
-        plt.plot(self.latencies, label="Inference Latency (ms)", color='blue')
-        plt.xlabel("Frame Number")
-        plt.ylabel("Latency (ms)")
-        plt.title("Inference Latency per Frame (YOLO V8)")
-        plt.grid(True)
-        plt.legend()
-
-        plt.subplot(1, 2, 2)
-        plt.plot(self.fps_values, label="FPS", color="orange")
-        plt.xlabel("Time (seconds)")
-        plt.ylabel("Frames per Second")
-        plt.title("FPS Over Time (YOLO V8)")
-        plt.grid(True)
-        plt.legend()
-
-        plt.tight_layout()
-        plt.savefig(performance_plot_path)
-        plt.close()
-        print(f"Saved performance plot to: {performance_plot_path}")
+            if self.source:
+                await asyncio.to_thread(self.source.close)
+                self.source = None
 
+            # Samples are already on disk; this only flushes the last second
+            self.metrics.close()
+            print(f"Metrics saved to: {self.metrics.directory} (plot with: python src/metrics_report.py yolo)")
 
     async def start(self):
         if not self.active:
@@ -153,6 +154,8 @@ class JpegStream:
                 self.task = None
 
 jpeg_stream = JpegStream()
+profiler = SamplingProfiler() # 🔬 Only samples while POST /profile runs
+PROFILE_FOCUS_FILES = ("yolo.py", "pipeline_stages.py", "detectors.py")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -185,3 +188,74 @@ async def start_stream():
 async def stop_stream():
     await jpeg_stream.stop()
     return {"message": "Stream stopped"}
+
+@app.get("/governor")
+async def governor_status():
+    return jpeg_stream.governor.status()
+
+@app.get("/memory")
+async def memory_status():
+    return jpeg_stream.memory_report.stats()
+
+@app.get("/latency")
+async def latency_status():
+    return jpeg_stream.latency_budget.stats()
+
+@app.post("/model/reload")
+async def reload_model(model_path: str = None, score_threshold: float = None, max_regression: float = None):
+    """Loads and warms up a new model (e.g. another NCNN export) in the background, then swaps it in between frames."""
+    reloader = jpeg_stream.model_reloader
+    if reloader.busy:
+        raise HTTPException(status_code=409, detail=f"A reload is already in progress ({reloader.state})")
+    if model_path and not os.path.exists(model_path):
+        raise HTTPException(status_code=404, detail=f"Model not found: {model_path}")
+
+    current = reloader.active_config or {"model_path": DEFAULT_YOLO_MODEL, "score_threshold": jpeg_stream.detector.score_threshold}
+    config = {
+        "model_path": model_path or current["model_path"],
+        "score_threshold": score_threshold if score_threshold is not None else current["score_threshold"],
+    }
+    reloader.start_reload(lambda: YoloDetector(**config), config, max_regression)
+    return {"message": "Reload started", **reloader.status()}
+
+@app.get("/model")
+async def model_status():
+    return jpeg_stream.model_reloader.status()
+
+@app.post("/profile")
+async def profile(seconds: float = Query(10.0, gt=0, le=MAX_DURATION_S),
+                  interval_ms: float = Query(5.0, ge=MIN_INTERVAL_S * 1000, le=MAX_INTERVAL_S * 1000),
+                  format: str = "json"):
+    try:
+        report = await asyncio.to_thread(profiler.profile, seconds, interval_ms / 1000, PROFILE_FOCUS_FILES)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "collapsed":
+        return PlainTextResponse(report["collapsed"])
+    return report
+
+@app.get("/analytics")
+async def analytics_status():
+    return jpeg_stream.analytics.snapshot()
+
+@app.websocket("/ws/analytics")
+async def analytics_websocket(websocket: WebSocket, interval_ms: float = Query(500, ge=10)):
+    await websocket.accept()
+
+    async def until_disconnected():
+        while True:
+            await websocket.receive_text() # Raises once the client is gone
+
+    # Without a pending receive, a client that left would only be noticed on the next send
+    disconnected = asyncio.create_task(until_disconnected())
+    last_version = None
+    try:
+        while not disconnected.done():
+            if jpeg_stream.analytics.version != last_version:
+                last_version = jpeg_stream.analytics.version
+                await websocket.send_json(jpeg_stream.analytics.snapshot())
+            await asyncio.wait([disconnected], timeout=interval_ms / 1000)
+    except Exception:
+        pass # Client went away
+    finally:
+        disconnected.cancel()
@@ -0,0 +1,309 @@
+# src/zone_analytics.py
+# Live counts over the detection stream: per-class object counts, zone occupancy and dwell
+# time, and line-crossing counts.
+#
+# Zones and lines come from a JSON file (path in TRACKER_ZONES), in frame pixel coordinates,
+# or in 0..1 fractions of the frame with "normalized": true:
+#
+#   {
+#     "normalized": true,
+#     "zones": [{"name": "doorway", "polygon": [[0.1, 0.5], [0.4, 0.5], [0.4, 1.0], [0.1, 1.0]], "classes": ["person"]}],
+#     "lines": [{"name": "entrance", "points": [[0.5, 0.0], [0.5, 1.0]], "classes": ["person", "car"]}]
+#   }
+#
+# "classes" is optional (default: every class). A line counts crossings in both directions:
+# "in" is a move onto the right-hand side of a->b as seen on screen (downwards across a line
+# drawn left to right), "out" the opposite. A centroid that lands exactly on the line hasn't
+# crossed yet; the crossing counts once the track reaches the other side.
+#
+# Detections are matched to the tracks of the previous update by nearest centroid
+# (CentroidTracker). Tracks are bucketed by class in a grid of max_distance cells, so a
+# detection is only compared with the tracks in its own and the 8 neighbouring cells:
+# O(detections + tracks) per update unless everything crowds into one spot. The
+# point-in-polygon and segment-crossing tests run vectorized over all tracks at once, and
+# aggregates are kept as running totals, so snapshot() never has to look at history.
+import json
+
+import cv2
+import numpy as np
+
+ZONE_COLOR = (255, 128, 0)
+LINE_COLOR = (0, 200, 255)
+
+
+def points_in_polygon(points, polygon):
+    """Even-odd ray casting for many points at once. points: (N, 2), polygon: (M, 2) -> (N,) bool."""
+    if len(points) == 0:
+        return np.zeros(0, dtype=bool)
+    x = points[:, 0:1]
+    y = points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    # An edge straddles the horizontal ray through the point, and the crossing is to its right
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(straddles & (x < crossing_x), axis=1) % 2 == 1
+
+
+def line_sides(points, a, b):
+    """Which side of the line a->b each point is on: +1 right (on screen), -1 left, 0 on the line."""
+    direction = b - a
+    return np.sign(direction[0] * (points[:, 1] - a[1]) - direction[1] * (points[:, 0] - a[0])).astype(int)
+
+
+def segment_crossings(starts, ends, a, b):
+    """For movements starts[i] -> ends[i], returns +1/-1 when crossing segment a-b (by side of a->b), else 0.
+
+    A movement that ends exactly on the line isn't a crossing; callers keep the last point that
+    was off the line as the start of the next movement instead.
+    """
+    if len(starts) == 0:
+        return np.zeros(0, dtype=int)
+    side_before, side_after = line_sides(starts, a, b), line_sides(ends, a, b)
+    # The line a-b must also be on opposite sides of the movement, or it passed beyond the ends
+    # (touching an end counts)
+    movement = ends - starts
+    end_a = np.sign(movement[:, 0] * (a[1] - starts[:, 1]) - movement[:, 1] * (a[0] - starts[:, 0]))
+    end_b = np.sign(movement[:, 0] * (b[1] - starts[:, 1]) - movement[:, 1] * (b[0] - starts[:, 0]))
+    crossed = (side_before * side_after < 0) & (end_a * end_b <= 0)
+    return np.where(crossed, side_after, 0).astype(int)
+
+
+class CentroidTracker:
+    """Greedy nearest-centroid matching of detections to the tracks of the previous update."""
+
+    def __init__(self, max_distance=150.0, max_missed=5):
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.next_id = 0
+        self.ids = np.zeros(0, dtype=int)
+        self.labels = np.zeros(0, dtype=object)
+        self.centroids = np.zeros((0, 2))
+        self.missed = np.zeros(0, dtype=int)
+
+    def update(self, detections):
+        """Returns (ids, labels, centroids) of the tracks seen in this update."""
+        labels = np.array([det.label for det in detections], dtype=object)
+        centroids = np.array([(det.x + det.w / 2, det.y + det.h / 2) for det in detections], dtype=float).reshape(-1, 2)
+
+        assigned = np.full(len(detections), -1)
+        matched_tracks = np.zeros(len(self.ids), dtype=bool)
+        if len(self.ids) and len(detections):
+            det_indices, track_indices, distances = self._candidate_pairs(labels, centroids)
+            # Closest pairs first, among the pairs close enough to match at all
+            order = np.argsort(distances)
+            for det_index, track_index in zip(det_indices[order], track_indices[order]):
+                if assigned[det_index] < 0 and not matched_tracks[track_index]:
+                    assigned[det_index] = track_index
+                    matched_tracks[track_index] = True
+
+        ids = np.empty(len(detections), dtype=int)
+        for det_index, track_index in enumerate(assigned):
+            if track_index >= 0:
+                ids[det_index] = self.ids[track_index]
+            else:
+                ids[det_index] = self.next_id
+                self.next_id += 1
+
+        # Unmatched tracks survive a few updates, so a missed detection doesn't restart the track
+        keep = ~matched_tracks & (self.missed + 1 <= self.max_missed)
+        self.ids = np.concatenate([ids, self.ids[keep]])
+        self.labels = np.concatenate([labels, self.labels[keep]])
+        self.centroids = np.concatenate([centroids, self.centroids[keep]])
+        self.missed = np.concatenate([np.zeros(len(ids), dtype=int), self.missed[keep] + 1])
+        return ids, labels, centroids
+
+    def _cells(self, centroids):
+        return np.floor(centroids / self.max_distance).astype(int)
+
+    def _candidate_pairs(self, labels, centroids):
+        """(detection indices, track indices, distances) of the same-class pairs within max_distance."""
+        # Anything within max_distance is in the same or an adjacent cell
+        grid = {}
+        for track_index, (label, (cell_x, cell_y)) in enumerate(zip(self.labels, self._cells(self.centroids))):
+            grid.setdefault((label, cell_x, cell_y), []).append(track_index)
+        det_indices, track_indices = [], []
+        for det_index, (label, (cell_x, cell_y)) in enumerate(zip(labels, self._cells(centroids))):
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for track_index in grid.get((label, cell_x + dx, cell_y + dy), ()):
+                        det_indices.append(det_index)
+                        track_indices.append(track_index)
+        det_indices, track_indices = np.array(det_indices, dtype=int), np.array(track_indices, dtype=int)
+        distances = np.linalg.norm(centroids[det_indices] - self.centroids[track_indices], axis=1).reshape(-1)
+        close = distances <= self.max_distance
+        return det_indices[close], track_indices[close], distances[close]
+
+
+class Zone:
+    def __init__(self, name, polygon, classes=None):
+        self.name = name
+        self.polygon = np.asarray(polygon, dtype=float)
+        self.classes = set(classes) if classes else None
+        self.inside = {}           # track id -> (label, entered at)
+        self.entries = 0
+        self.dwell_count = 0
+        self.dwell_total_s = 0.0
+        self.dwell_max_s = 0.0
+
+    def update(self, ids, labels, inside, timestamp, present_ids):
+        for track_id, label, is_inside in zip(ids, labels, inside):
+            if self.classes and label not in self.classes:
+                continue
+            track_id = int(track_id)
+            if is_inside and track_id not in self.inside:
+                self.inside[track_id] = (label, timestamp)
+                self.entries += 1
+            elif not is_inside and track_id in self.inside:
+                self._leave(track_id, timestamp)
+        # Tracks that vanished (left the frame or were lost) leave the zone too
+        for track_id in [t for t in self.inside if t not in present_ids]:
+            self._leave(track_id, timestamp)
+
+    def _leave(self, track_id, timestamp):
+        _, entered_at = self.inside.pop(track_id)
+        dwell = timestamp - entered_at
+        self.dwell_count += 1
+        self.dwell_total_s += dwell
+        self.dwell_max_s = max(self.dwell_max_s, dwell)
+
+    def snapshot(self, now):
+        by_class = {}
+        for label, _ in self.inside.values():
+            by_class[label] = by_class.get(label, 0) + 1
+        current_dwell = [now - entered_at for _, entered_at in self.inside.values()]
+        return {
+            "occupancy": len(self.inside),
+            "by_class": by_class,
+            "entries": self.entries,
+            "dwell_completed": self.dwell_count,
+            "dwell_mean_s": self.dwell_total_s / self.dwell_count if self.dwell_count else None,
+            "dwell_max_s": max([self.dwell_max_s] + current_dwell),
+            "current_dwell_s": sorted(current_dwell, reverse=True),
+        }
+
+
+class CountingLine:
+    def __init__(self, name, points, classes=None):
+        self.name = name
+        self.a, self.b = (np.asarray(p, dtype=float) for p in points)
+        self.classes = set(classes) if classes else None
+        self.counts = {"in": 0, "out": 0}
+        self.by_class = {}
+        self.last_off_line = {}    # track id -> last centroid that wasn't exactly on the line
+
+    def update(self, ids, labels, centroids, present_ids):
+        counted = np.ones(len(ids), dtype=bool)
+        if self.classes:
+            counted = np.array([label in self.classes for label in labels], dtype=bool)
+        if counted.any():
+            ids, labels, centroids = ids[counted], labels[counted], centroids[counted]
+            starts = np.array([self.last_off_line.get(int(track_id), (np.nan, np.nan)) for track_id in ids], dtype=float)
+            moved = ~np.isnan(starts[:, 0])
+            directions = np.zeros(len(ids), dtype=int)
+            directions[moved] = segment_crossings(starts[moved], centroids[moved], self.a, self.b)
+            for label, direction in zip(labels, directions):
+                if direction == 0:
+                    continue
+                key = "in" if direction > 0 else "out"
+                self.counts[key] += 1
+                class_counts = self.by_class.setdefault(label, {"in": 0, "out": 0})
+                class_counts[key] += 1
+
+            # A centroid on the line keeps the previous start, so the crossing counts once it's over
+            for track_id, centroid, side in zip(ids, centroids, line_sides(centroids, self.a, self.b)):
+                if side != 0:
+                    self.last_off_line[int(track_id)] = (centroid[0], centroid[1])
+        for track_id in [t for t in self.last_off_line if t not in present_ids]:
+            del self.last_off_line[track_id]
+
+    def snapshot(self):
+        return {**self.counts, "net": self.counts["in"] - self.counts["out"], "by_class": self.by_class}
+
+
+class ZoneAnalytics:
+    def __init__(self, zones=(), lines=(), normalized=False, tracker=None):
+        self.zones = list(zones)
+        self.lines = list(lines)
+        self.normalized = normalized
+        self.tracker = tracker or CentroidTracker()
+        self.scaled_for = None     # Frame size the zone/line coordinates were last scaled to
+        self.updates = 0
+        self.last_update_time = None
+        self.objects = {}
+        self.tracks = []
+        self.version = 0           # Bumped on every update; lets pollers skip unchanged snapshots
+
+    @classmethod
+    def from_config(cls, path):
+        """Loads zones and lines from a JSON file; with no path, only object counts and tracks are kept."""
+        if not path:
+            return cls()
+        with open(path, 'r') as f:
+            config = json.load(f)
+        zones = [Zone(z["name"], z["polygon"], z.get("classes")) for z in config.get("zones", [])]
+        lines = [CountingLine(l["name"], l["points"], l.get("classes")) for l in config.get("lines", [])]
+        return cls(zones, lines, normalized=config.get("normalized", False))
+
+    def _scale_to(self, width, height):
+        """Converts normalized coordinates to pixels once per frame size."""
+        if not self.normalized or self.scaled_for == (width, height):
+            return
+        scale = np.array([width, height], dtype=float)
+        previous = np.array(self.scaled_for, dtype=float) if self.scaled_for else np.ones(2)
+        for zone in self.zones:
+            zone.polygon = zone.polygon / previous * scale
+        for line in self.lines:
+            line.a, line.b = line.a / previous * scale, line.b / previous * scale
+        self.scaled_for = (width, height)
+
+    def update(self, detections, timestamp, frame_size):
+        """Feeds the detections of one inference; timestamp is the frame's capture time."""
+        self._scale_to(*frame_size)
+        ids, labels, centroids = self.tracker.update(detections)
+        # A track that's briefly missed stays inside its zone until the tracker gives up on it
+        present_ids = set(int(track_id) for track_id in self.tracker.ids)
+
+        for zone in self.zones:
+            zone.update(ids, labels, points_in_polygon(centroids, zone.polygon), timestamp, present_ids)
+        for line in self.lines:
+            line.update(ids, labels, centroids, present_ids)
+
+        self.objects = {}
+        for label in labels:
+            self.objects[label] = self.objects.get(label, 0) + 1
+        self.tracks = [
+            {"id": int(track_id), "label": det.label, "score": det.score, "x": det.x, "y": det.y, "w": det.w, "h": det.h}
+            for track_id, det in zip(ids, detections)
+        ]
+        self.updates += 1
+        self.last_update_time = timestamp
+        self.version += 1
+
+    def snapshot(self):
+        now = self.last_update_time or 0.0
+        return {
+            "version": self.version,
+            "updates": self.updates,
+            "objects": self.objects,
+            "tracks": self.tracks,
+            "zones": {zone.name: zone.snapshot(now) for zone in self.zones},
+            "lines": {line.name: line.snapshot() for line in self.lines},
+        }
+
+    def draw(self, frame):
+        """Outlines the zones and lines with their live counts."""
+        self._scale_to(frame.shape[1], frame.shape[0])
+        for zone in self.zones:
+            polygon = zone.polygon.astype(np.int32)
+            cv2.polylines(frame, [polygon], True, ZONE_COLOR, 2)
+            x, y = polygon.min(axis=0)
+            cv2.putText(frame, f"{zone.name}: {len(zone.inside)}", (int(x) + 5, int(y) + 25),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, ZONE_COLOR, 2)
+        for line in self.lines:
+            a, b = tuple(line.a.astype(int)), tuple(line.b.astype(int))
+            cv2.line(frame, a, b, LINE_COLOR, 2)
+            cv2.putText(frame, f"{line.name}: in {line.counts['in']} out {line.counts['out']}", (a[0] + 5, a[1] + 25),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, LINE_COLOR, 2)
+        return frame
@@ -0,0 +1,5 @@
+# The modules in src/ are run as scripts and import each other as top-level modules
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,52 @@
+from cascade import ModelCascade
+from pipeline_stages import Detection
+
+
+class FixedDetector:
+    input_shape = (1, 300, 300, 3)
+    preprocess_ms = inference_ms = postprocess_ms = 1.0
+
+    def __init__(self, score):
+        self.score = score
+        self.score_threshold = 0.5
+        self.calls = 0
+
+    def detect(self, img):
+        self.calls += 1
+        return [Detection("person", 0, self.score, 10, 10, 50, 100)]
+
+
+def cascade(cheap_score, audit_every):
+    cheap, expensive = FixedDetector(cheap_score), FixedDetector(0.9)
+    return ModelCascade(cheap, expensive, band_low=0.3, band_high=0.6, audit_every=audit_every), expensive
+
+
+def test_audit_and_escalation_on_the_same_frame_count_once_each():
+    model, expensive = cascade(cheap_score=0.45, audit_every=1) # Every frame is ambiguous and an audit
+    model.detect(None)
+    assert model.audits == 1
+    assert model.escalations == 1
+    assert expensive.calls == 1 # But the expensive model only runs once
+
+    stats = model.stats()
+    assert stats["escalation_rate"] == 1.0
+    assert stats["audit_rate"] == 1.0
+
+
+def test_confident_frames_stay_on_the_cheap_model():
+    model, expensive = cascade(cheap_score=0.8, audit_every=0)
+    for _ in range(5):
+        detections = model.detect(None)
+        assert model.escalated is False
+    assert [det.score for det in detections] == [0.8]
+    assert expensive.calls == 0
+    assert model.stats()["escalation_rate"] == 0.0
+
+
+def test_audit_frames_escalate_confident_frames():
+    model, expensive = cascade(cheap_score=0.8, audit_every=3)
+    for _ in range(6):
+        model.detect(None)
+    assert model.audits == 2
+    assert model.escalations == 0
+    assert expensive.calls == 2
@@ -0,0 +1,152 @@
+from governor import InferenceGovernor, SimulatedSensors
+
+INFERENCE_S = 0.1         # The loop is inference-bound at full duty
+SKIPPED_FRAME_S = 0.005   # Annotating and sending a frame without inference
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_governor(ambient_c=45.0):
+    clock = FakeClock()
+    sensors = SimulatedSensors(ambient_c=ambient_c, heat_rise_c=45.0, time_constant_s=60.0, clock=clock)
+    return InferenceGovernor(sensors=sensors, clock=clock), sensors, clock
+
+
+def run(governor, sensors, clock, seconds):
+    """Streams frames for `seconds` of simulated time; returns the share of it spent in inference."""
+    start = clock.now
+    busy_s = 0.0
+    temperatures = []
+    while clock.now - start < seconds:
+        if governor.should_infer():
+            clock.now += INFERENCE_S
+            busy_s += INFERENCE_S
+            governor.record_inference(INFERENCE_S)
+        else:
+            clock.now += SKIPPED_FRAME_S
+        sensors.load = governor.duty # The chip heats with the time spent in inference
+        temperatures.append(sensors.temperature)
+    return busy_s / (clock.now - start), temperatures
+
+
+def test_cool_chip_infers_every_frame():
+    governor, sensors, clock = make_governor(ambient_c=30.0)
+    run(governor, sensors, clock, 60)
+    assert governor.duty == 1.0
+    assert governor.skipped_frames == 0
+
+
+def test_heating_lowers_duty_and_keeps_below_limit():
+    governor, sensors, clock = make_governor()
+    busy_share, temperatures = run(governor, sensors, clock, 900)
+
+    # Without the governor the chip settles at 45 + 45 = 90°C, far past the firmware's 80°C
+    assert governor.duty < 1.0
+    assert governor.skipped_frames > 0
+    assert max(temperatures) < governor.hard_limit_c
+    assert busy_share < 1.0
+
+    # Idle scheduling: at steady state, inference takes up `duty` of wall time
+    steady_share, _ = run(governor, sensors, clock, 120)
+    assert abs(steady_share - governor.duty) < 0.05
+
+
+def test_duty_eases_down_without_stepping():
+    governor, sensors, clock = make_governor()
+    duties = []
+    for _ in range(900):
+        run(governor, sensors, clock, 1)
+        duties.append(governor.duty)
+    steps = [abs(b - a) for a, b in zip(duties, duties[1:])]
+    assert max(steps) <= governor.max_step + 1e-9
+    assert min(duties) >= governor.min_duty
+
+
+def test_cooling_restores_full_duty():
+    governor, sensors, clock = make_governor()
+    run(governor, sensors, clock, 900)
+    assert governor.duty < 1.0
+
+    sensors.ambient_c = 20.0 # Full duty now settles at 65°C, below the soft limit
+    run(governor, sensors, clock, 600)
+    assert governor.duty == 1.0
+    assert governor.predicted_temperature() < governor.soft_limit_c
+
+
+def test_record_inference_schedules_idle_time():
+    governor, sensors, clock = make_governor()
+    governor.sample() # The next sample is a second away, so the duty cycle stays put
+    governor.duty = 0.5
+    assert governor.should_infer()
+    governor.record_inference(0.1)
+
+    # At 50% duty, 100ms of inference is followed by 100ms without
+    clock.now += 0.09
+    assert not governor.should_infer()
+    clock.now += 0.02
+    assert governor.should_infer()
+
+
+def test_missing_temperature_never_throttles():
+    class NoSensors:
+        def read_temperature(self):
+            return None
+
+        def read_cpu_load(self):
+            return None
+
+    clock = FakeClock()
+    governor = InferenceGovernor(sensors=NoSensors(), clock=clock)
+    for _ in range(100):
+        clock.now += 1.0
+        governor.sample()
+    assert governor.duty == 1.0
+    assert governor.status()["temperature_c"] is None
+
+
+class ScriptedSensors:
+    """A temperature ramp with a fixed CPU load."""
+
+    def __init__(self, clock, load, start_c=60.0, rise_c_per_s=0.05):
+        self.clock = clock
+        self.load = load
+        self.start_c = start_c
+        self.rise_c_per_s = rise_c_per_s
+
+    def read_temperature(self):
+        return self.start_c + self.rise_c_per_s * self.clock()
+
+    def read_cpu_load(self):
+        return [self.load] * 4
+
+
+def test_sustained_load_backs_off_earlier():
+    duties = {}
+    for load in (0.3, 1.0):
+        clock = FakeClock()
+        governor = InferenceGovernor(sensors=ScriptedSensors(clock, load, start_c=64.0), clock=clock)
+        for _ in range(60):
+            clock.now += 1.0
+            governor.sample()
+        duties[load] = governor.duty
+        if load == 1.0:
+            assert governor.effective_soft_limit() < governor.soft_limit_c
+        else:
+            assert governor.effective_soft_limit() == governor.soft_limit_c
+    # Same temperature ramp; the saturated chip is already throttling, the idle one isn't yet
+    assert duties[1.0] < duties[0.3]
+
+
+def test_load_alone_does_not_throttle_a_cool_chip():
+    clock = FakeClock()
+    governor = InferenceGovernor(sensors=ScriptedSensors(clock, 1.0, start_c=50.0, rise_c_per_s=0.0), clock=clock)
+    for _ in range(60):
+        clock.now += 1.0
+        governor.sample()
+    assert governor.duty == 1.0
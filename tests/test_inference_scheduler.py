@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from inference_scheduler import InferenceScheduler
+
+INFERENCE_S = 0.01
+TURNAROUND_S = 0.002   # Drawing and sending a frame before submitting the next one
+
+
+class SleepingDetector:
+    max_batch = 1
+
+    def detect(self, frame):
+        time.sleep(INFERENCE_S)
+        return []
+
+
+class BatchingDetector(SleepingDetector):
+    max_batch = 3
+
+    def __init__(self):
+        self.batches = []
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        self.batches.append(list(frames))
+        time.sleep(INFERENCE_S)
+        return [[] for _ in frames]
+
+
+async def run_streams(priorities, detectors=1, seconds=2.0):
+    """Runs one always-busy stream per priority against the scheduler; returns frames processed per stream."""
+    scheduler = InferenceScheduler(detectors if isinstance(detectors, list) else [SleepingDetector() for _ in range(detectors)])
+    for name, priority in priorities.items():
+        scheduler.register(name, priority)
+    scheduler.start()
+
+    async def stream(name):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            await scheduler.submit(name, name)
+            await asyncio.sleep(TURNAROUND_S)
+
+    try:
+        await asyncio.gather(*(stream(name) for name in priorities))
+    finally:
+        await asyncio.to_thread(scheduler.stop)
+    return {name: stats["processed"] for name, stats in scheduler.stats()["streams"].items()}
+
+
+def test_priority_sets_throughput_ratio():
+    processed = asyncio.run(run_streams({"high": 2, "low": 1}))
+    assert 1.7 < processed["high"] / processed["low"] < 2.3
+
+
+def test_equal_priorities_get_equal_service():
+    processed = asyncio.run(run_streams({"high": 3, "a": 1, "b": 1, "c": 1}))
+    equal = [processed["a"], processed["b"], processed["c"]]
+    assert max(equal) - min(equal) <= 0.1 * max(equal)
+    assert 2.5 < processed["high"] / (sum(equal) / len(equal)) < 3.5
+
+
+def test_spare_detectors_serve_everyone():
+    # With a detector per stream there's no contention, so priority doesn't hold anyone back
+    processed = asyncio.run(run_streams({"high": 2, "low": 1}, detectors=2))
+    assert 0.8 < processed["high"] / processed["low"] < 1.25
+
+
+def test_batches_frames_from_several_streams():
+    detector = BatchingDetector()
+    processed = asyncio.run(run_streams({"a": 1, "b": 1, "c": 1}, detectors=[detector], seconds=1.0))
+    multi_stream_batches = [batch for batch in detector.batches if len(set(batch)) > 1]
+    assert multi_stream_batches
+    assert all(len(batch) <= detector.max_batch and len(set(batch)) == len(batch) for batch in detector.batches)
+    assert sum(len(batch) for batch in detector.batches) == sum(processed.values())
@@ -0,0 +1,182 @@
+import asyncio
+
+import numpy as np
+
+from model_reload import PROBATION_STALL_S, ModelReloader
+
+FRAME = np.zeros((48, 64, 3), dtype=np.uint8)
+BASELINE_MS = 10.0
+
+
+class FakeDetector:
+    def __init__(self, name, fail_after=None):
+        self.name = name
+        self.fail_after = fail_after # Raise once this many detect() calls (warmup included) succeeded
+        self.calls = 0
+
+    def detect(self, img):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise RuntimeError(f"{self.name} broke")
+        return []
+
+
+def make_reloader():
+    reloader = ModelReloader(warmup_runs=3, probation_frames=30, max_regression=0.25)
+    for _ in range(30):
+        reloader.record_inference(BASELINE_MS) # The old model's latencies become the baseline
+    return reloader
+
+
+async def reload(reloader, build, config):
+    """Starts a reload and feeds it frames, like the stream would, until it's staged or has failed."""
+    reloader.start_reload(build, config)
+    while reloader.state in ("loading", "warming"):
+        reloader.offer_frame(FRAME)
+        await asyncio.sleep(0.01)
+
+
+def run_frames(reloader, detector, inference_ms, frames):
+    """The frame loop: swap at the boundary, then record one inference per frame."""
+    for _ in range(frames):
+        detector = reloader.swap(detector)
+        reloader.record_inference(inference_ms)
+    return reloader.swap(detector)
+
+
+def failing_build():
+    raise FileNotFoundError("no such model")
+
+
+def test_fast_enough_model_is_promoted():
+    old, new = FakeDetector("old"), FakeDetector("new")
+    reloader = make_reloader()
+    asyncio.run(reload(reloader, lambda: new, {"model": "new"}))
+    assert reloader.state == "staged"
+    assert reloader.busy is False
+
+    detector = reloader.swap(old)
+    assert detector is new and reloader.state == "probation"
+    assert run_frames(reloader, detector, BASELINE_MS * 1.1, 30) is new
+    assert reloader.state == "promoted"
+    assert reloader.status()["active"] == {"model": "new"}
+    assert reloader.previous is None
+
+
+def test_regression_rolls_back():
+    old, new = FakeDetector("old"), FakeDetector("new")
+    reloader = make_reloader()
+    asyncio.run(reload(reloader, lambda: new, {"model": "new"}))
+    detector = run_frames(reloader, old, BASELINE_MS * 2, 30)
+    assert detector is old
+    assert reloader.state == "rolled_back"
+    assert "median inference" in reloader.message
+    assert reloader.status()["active"] is None
+
+
+def test_error_on_probation_rolls_back():
+    old, new = FakeDetector("old"), FakeDetector("new")
+    reloader = make_reloader()
+    asyncio.run(reload(reloader, lambda: new, {"model": "new"}))
+    detector = reloader.swap(old)
+    assert reloader.record_error(RuntimeError("new broke")) is True
+    assert reloader.swap(detector) is old
+    assert reloader.state == "rolled_back"
+    assert "new broke" in reloader.message
+
+    # Outside probation errors are the caller's to handle
+    assert reloader.record_error(RuntimeError("old broke")) is False
+
+
+def test_failed_warmup_keeps_the_current_model():
+    old = FakeDetector("old")
+    reloader = make_reloader()
+    asyncio.run(reload(reloader, lambda: FakeDetector("new", fail_after=0), {"model": "new"}))
+    assert reloader.state == "failed"
+    assert reloader.swap(old) is old
+
+
+def test_newer_reload_replaces_a_staged_one():
+    old, first, second = FakeDetector("old"), FakeDetector("first"), FakeDetector("second")
+    reloader = make_reloader()
+
+    async def reload_twice():
+        await reload(reloader, lambda: first, {"model": "first"})
+        assert reloader.state == "staged" # The stream is stopped, so it stays staged
+        await reload(reloader, lambda: second, {"model": "second"})
+
+    asyncio.run(reload_twice())
+    assert reloader.swap(old) is second
+    assert run_frames(reloader, second, BASELINE_MS, 30) is second
+    assert reloader.status()["active"] == {"model": "second"}
+
+
+def test_reload_is_refused_during_an_active_probation():
+    old, new = FakeDetector("old"), FakeDetector("new")
+    reloader = make_reloader()
+
+    async def reload_during_probation():
+        await reload(reloader, lambda: new, {"model": "new"})
+        run_frames(reloader, old, BASELINE_MS, 5)
+        assert reloader.busy
+        try:
+            reloader.start_reload(lambda: FakeDetector("other"), {"model": "other"})
+        except RuntimeError:
+            return True
+        return False
+
+    assert asyncio.run(reload_during_probation())
+
+
+def stalled_probation():
+    """A reloader whose new model went live, then the stream stopped mid-probation."""
+    old, stalled = FakeDetector("old"), FakeDetector("stalled")
+    reloader = make_reloader()
+    asyncio.run(reload(reloader, lambda: stalled, {"model": "stalled"}))
+    detector = run_frames(reloader, old, BASELINE_MS, 5)
+    assert detector is stalled
+    reloader.last_probation_activity -= PROBATION_STALL_S + 1
+    assert reloader.busy is False
+    return reloader, old, stalled
+
+
+def test_stalled_probation_is_still_judged_after_a_failed_replacement():
+    reloader, old, stalled = stalled_probation()
+    asyncio.run(reload(reloader, failing_build, {"model": "missing"}))
+    assert reloader.state == "failed"
+    assert reloader.status()["on_probation"] == {"model": "stalled"}
+
+    # The stream resumes with the stalled model, which turns out to be too slow
+    assert run_frames(reloader, stalled, BASELINE_MS * 2, 25) is old
+    assert reloader.previous is None
+    assert reloader.status()["on_probation"] is None
+    assert reloader.status()["active"] is None
+
+
+def test_stalled_probation_is_promoted_if_it_finishes_first():
+    reloader, old, stalled = stalled_probation()
+    replacement = FakeDetector("replacement")
+
+    async def resume_during_reload():
+        reloader.start_reload(lambda: replacement, {"model": "replacement"})
+        run_frames(reloader, stalled, BASELINE_MS, 25) # Frames arrive while it's still loading
+        assert reloader.status()["active"] == {"model": "stalled"}
+        while reloader.state in ("loading", "warming"):
+            reloader.offer_frame(FRAME)
+            await asyncio.sleep(0.01)
+
+    asyncio.run(resume_during_reload())
+    assert reloader.swap(stalled) is replacement
+    assert reloader.previous is stalled # The promoted model is now the one to roll back to
+
+
+def test_replacing_a_stalled_probation_rolls_back_to_the_last_model_that_passed():
+    reloader, old, stalled = stalled_probation()
+    replacement = FakeDetector("replacement")
+    asyncio.run(reload(reloader, lambda: replacement, {"model": "replacement"}))
+    assert reloader.swap(stalled) is replacement
+    assert reloader.previous is old
+    assert reloader.baseline_ms == BASELINE_MS
+
+    assert run_frames(reloader, replacement, BASELINE_MS * 2, 30) is old
+    assert reloader.state == "rolled_back"
@@ -0,0 +1,77 @@
+from pipeline_stages import Detection
+from target_lock import TargetLock
+
+FRAME_W, FRAME_H = 1920, 1080
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def person(score=0.9, x=900, y=500):
+    return Detection("person", 0, score, x, y, 40, 80)
+
+
+def locked_target(max_misses=3):
+    clock = FakeClock()
+    lock = TargetLock("person", max_misses=max_misses, clock=clock)
+    assert lock.plan(FRAME_W, FRAME_H) is None # Nothing locked yet: full-frame search
+    lock.update([person()], None)
+    assert lock.locked
+    return lock, clock
+
+
+def test_lock_crops_around_target():
+    lock, clock = locked_target()
+    clock.now += 0.1
+    crop = lock.plan(FRAME_W, FRAME_H)
+    assert crop is not None
+    x0, y0, x1, y1 = crop
+    assert x0 <= 920 <= x1 and y0 <= 540 <= y1
+    assert x1 - x0 >= 300
+
+
+def test_unlocks_after_max_misses_consecutive_misses():
+    lock, clock = locked_target(max_misses=3)
+    for miss in range(1, 3):
+        clock.now += 0.1
+        crop = lock.plan(FRAME_W, FRAME_H)
+        assert crop is not None
+        lock.update([], crop)
+        assert lock.locked, f"unlocked after only {miss} misses"
+
+    # The third missed crop releases the lock; the next inference searches the full frame
+    clock.now += 0.1
+    crop = lock.plan(FRAME_W, FRAME_H)
+    assert crop is not None
+    lock.update([], crop)
+    assert not lock.locked
+    assert lock.locks_lost == 1
+    assert lock.plan(FRAME_W, FRAME_H) is None
+
+
+def test_a_hit_resets_the_miss_count():
+    lock, clock = locked_target(max_misses=3)
+    for detections in ([], [], [person(score=0.55)], [], []):
+        clock.now += 0.1
+        lock.update(detections, lock.plan(FRAME_W, FRAME_H))
+    assert lock.locked
+
+
+def test_full_search_after_reacquire_interval():
+    lock, clock = locked_target()
+    clock.now += lock.reacquire_interval_s - 0.1
+    crop = lock.plan(FRAME_W, FRAME_H)
+    assert crop is not None
+    lock.update([person()], crop)
+
+    clock.now += 0.1
+    assert lock.plan(FRAME_W, FRAME_H) is None # Safety-net search, although still locked
+    assert lock.locked
+    lock.update([person()], None)
+    clock.now += 0.1
+    assert lock.plan(FRAME_W, FRAME_H) is not None
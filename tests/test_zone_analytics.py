@@ -0,0 +1,90 @@
+from pipeline_stages import Detection
+from zone_analytics import CentroidTracker, CountingLine, Zone, ZoneAnalytics
+
+FRAME_SIZE = (1000, 1000)
+
+
+def det(label, cx, cy, size=20):
+    """A detection centred on (cx, cy)."""
+    return Detection(label, 0, 0.9, cx - size / 2, cy - size / 2, size, size)
+
+
+def feed(analytics, frames, start=0.0):
+    """Runs one update per frame (a list of detections), one second apart."""
+    for i, detections in enumerate(frames):
+        analytics.update(detections, start + i, FRAME_SIZE)
+    return analytics.snapshot()
+
+
+def line_analytics(classes=None):
+    # Drawn left to right, so "in" is downwards on screen
+    return ZoneAnalytics(lines=[CountingLine("door", [[0, 500], [1000, 500]], classes)])
+
+
+def test_crossing_through_a_centroid_on_the_line_counts_once():
+    lines = feed(line_analytics(), [[det("person", 300, y)] for y in (480, 500, 520)])["lines"]
+    assert lines["door"]["in"] == 1
+    assert lines["door"]["out"] == 0
+
+
+def test_touching_the_line_and_going_back_counts_nothing():
+    lines = feed(line_analytics(), [[det("person", 300, y)] for y in (480, 500, 480)])["lines"]
+    assert lines["door"]["in"] == lines["door"]["out"] == 0
+
+
+def test_crossings_count_both_ways():
+    lines = feed(line_analytics(), [[det("person", 300, y)] for y in (450, 550, 450)])["lines"]
+    assert lines["door"]["in"] == 1
+    assert lines["door"]["out"] == 1
+    assert lines["door"]["net"] == 0
+
+
+def test_line_only_counts_its_classes():
+    frames = [[det("person", 300, y), det("car", 700, y)] for y in (450, 550)]
+    lines = feed(line_analytics(classes=["person"]), frames)["lines"]
+    assert lines["door"]["in"] == 1
+    assert lines["door"]["by_class"] == {"person": {"in": 1, "out": 0}}
+
+
+def test_zone_entry_leave_and_dwell():
+    analytics = ZoneAnalytics(zones=[Zone("desk", [[0, 0], [200, 0], [200, 200], [0, 200]], ["person"])])
+    # The person walks in and out again; the car parks inside but isn't a counted class
+    frames = [[det("person", x, 100), det("car", 100, 150)] for x in (300, 150, 100, 150, 300)]
+    zone = feed(analytics, frames)["zones"]["desk"]
+    assert zone["entries"] == 1
+    assert zone["occupancy"] == 0
+    assert zone["dwell_completed"] == 1
+    assert zone["dwell_mean_s"] == 3.0 # In at t=1, out at t=4
+
+
+def test_zone_reports_ongoing_dwell():
+    analytics = ZoneAnalytics(zones=[Zone("desk", [[0, 0], [200, 0], [200, 200], [0, 200]])])
+    zone = feed(analytics, [[det("person", 100, 100)]] * 3)["zones"]["desk"]
+    assert zone["occupancy"] == 1
+    assert zone["by_class"] == {"person": 1}
+    assert zone["current_dwell_s"] == [2.0]
+
+
+def test_lost_track_leaves_the_zone_once_the_tracker_gives_up():
+    analytics = ZoneAnalytics(zones=[Zone("desk", [[0, 0], [200, 0], [200, 200], [0, 200]])],
+                              tracker=CentroidTracker(max_missed=2))
+    frames = [[det("person", 100, 100)], [], [], []]
+    snapshots = [feed(analytics, [frame], start=i)["zones"]["desk"] for i, frame in enumerate(frames)]
+    assert [s["occupancy"] for s in snapshots] == [1, 1, 1, 0] # A couple of missed detections are tolerated
+    assert snapshots[-1]["dwell_mean_s"] == 3.0
+
+
+def test_tracker_keeps_ids_across_grid_cells():
+    tracker = CentroidTracker(max_distance=100)
+    ids, _, _ = tracker.update([det("person", 95, 95), det("person", 800, 800)])
+    # Both move into the next grid cell, diagonally, but stay within max_distance
+    moved, _, _ = tracker.update([det("person", 805, 810), det("person", 150, 160)])
+    assert list(moved) == [ids[1], ids[0]]
+
+
+def test_tracker_never_matches_far_or_across_classes():
+    tracker = CentroidTracker(max_distance=100)
+    ids, _, _ = tracker.update([det("person", 100, 100)])
+    new_ids, _, _ = tracker.update([det("car", 100, 100), det("person", 300, 100)])
+    assert ids[0] not in new_ids
+    assert len(set(new_ids)) == 2